@@ -1,43 +1,126 @@
+import os
 import torch
 import cv2
 import numpy as np
-from torchvision import transforms
-from model import DeepfakeDetector
-from video_utils import extract_frames
-from face_utils import extract_faces
+from model_export import AI_THRESHOLD, DETECTOR_MODE, INPUT_SIZE, load_detector
+from sequential import EARLY_EXIT, SequentialTest
+from video_utils import iter_frames
+from face_utils import track_faces
+from lazy_model import LazyModel
 
 device = "cpu"
 
-model = DeepfakeDetector().to(device)
-model.eval()
+# --- Settings ---
+FACE_BATCH_SIZE = int(os.environ.get("FACE_BATCH_SIZE", 0))  # 0 = เลือกตามจำนวน thread
+TORCH_THREADS = int(os.environ.get("TORCH_THREADS", 0))  # 0 = ค่า default ของ torch
 
-transform = transforms.Compose([
-    transforms.ToPILImage(),
-    transforms.Resize((299, 299)),
-    transforms.ToTensor(),
-])
+def load_model():
+    if TORCH_THREADS > 0:
+        torch.set_num_threads(TORCH_THREADS)
+    # DETECTOR_MODE = fp32 / torchscript / int8 (ดู model_export)
+    return load_detector(DETECTOR_MODE).to(device)
 
-def detect_ai_generated(video_path):
-    frames = extract_frames(video_path)
+# สร้าง ResNet-50 ตอนเรียกใช้ครั้งแรก ไม่ใช่ตอน import
+model = LazyModel(load_model, "deepfake_resnet")
+
+
+def preprocess_faces(faces, out):
+    """
+    Resize BGR face crops into `out`, a preallocated float32 (N, H, W, 3)
+    buffer, as RGB scaled to [0, 1] (same as ToPILImage -> Resize ->
+    ToTensor). Returns an NCHW (channels_last) tensor sharing memory with
+    `out`.
+    """
+    size = out.shape[1]
+    resized = np.empty((size, size, 3), np.uint8)
+    for i, face in enumerate(faces):
+        # ย่อใช้ INTER_AREA (ใกล้เคียง antialias ของ PIL), ขยายใช้ bilinear
+        shrink = face.shape[0] > size or face.shape[1] > size
+        cv2.resize(face, (size, size), dst=resized,
+                   interpolation=cv2.INTER_AREA if shrink else cv2.INTER_LINEAR)
+        # BGR -> RGB แล้วหาร 255 ลง buffer โดยตรง
+        np.multiply(resized[..., ::-1], 1 / 255, out=out[i])
+    return torch.from_numpy(out[:len(faces)]).permute(0, 3, 1, 2)
+
+
+def default_batch_size():
+    # CPU thread เดียว batch ใหญ่ไม่ช่วย (cache พอดีกว่าที่ batch 1)
+    return 8 if torch.get_num_threads() > 1 else 1
+
+
+def score_faces(faces, batch_size=FACE_BATCH_SIZE):
+    """Fake probability of every BGR face crop, `batch_size` crops per forward pass."""
+    if not faces:
+        return []
+    net = model.get()
+    batch_size = batch_size or default_batch_size()
+    buffer = np.empty((min(batch_size, len(faces)), INPUT_SIZE, INPUT_SIZE, 3), np.float32)
     scores = []
+    with torch.inference_mode():
+        for start in range(0, len(faces), batch_size):
+            x = preprocess_faces(faces[start:start + batch_size], buffer).to(device)
+            scores.extend(torch.sigmoid(net(x)).flatten().tolist())
+    return scores
 
-    for frame in frames:
-        faces = extract_faces(frame)
 
-        for face in faces:
-            face = cv2.cvtColor(face, cv2.COLOR_BGR2RGB)
-            x = transform(face).unsqueeze(0).to(device)
+def analyze(video_path, early_exit=EARLY_EXIT, batch_size=FACE_BATCH_SIZE):
+    """
+    Returns {"verdict", "score", "frames_used", "faces_used", "early_exit",
+    "sequential"}. With `early_exit`, reading frames stops once the running
+    score's confidence interval is clear of AI_THRESHOLD.
+    """
+    batch_size = batch_size or default_batch_size()
+    test = SequentialTest(AI_THRESHOLD)
+    scores = []
+    pending = []
+    frames_used = 0
+    stopped = False
+
+    def frames():
+        nonlocal frames_used
+        for frame in iter_frames(video_path, max_frames=20):
+            frames_used += 1
+            yield frame
+
+    # หน้าเดียวกันในเฟรมติดกันส่งเข้าโมเดลไม่กี่ครั้ง
+    for face in track_faces(frames()):
+        pending.append(face)
+        # ครบ batch หรือคะแนนที่รออยู่พอให้ตัดสินได้แล้ว
+        if len(pending) < batch_size and not (early_exit and test.could_stop(len(pending))):
+            continue
+        if early_exit:
+            del pending[test.room(len(pending)):]
+        batch_scores = score_faces(pending, batch_size)
+        pending = []
+        scores.extend(batch_scores)
+        test.add_many(batch_scores)
+        if early_exit and test.done():
+            stopped = True
+            break
 
-            with torch.no_grad():
-                output = model(x)
-                prob = torch.sigmoid(output).item()
-                scores.append(prob)
+    if early_exit:
+        del pending[test.room(len(pending)):]
+    if pending:
+        batch_scores = score_faces(pending, batch_size)
+        scores.extend(batch_scores)
+        test.add_many(batch_scores)
 
+    usage = {
+        "frames_used": frames_used,
+        "faces_used": len(scores),
+        "early_exit": stopped,
+        "sequential": test.summary(),
+    }
     if not scores:
-        return "UNKNOWN", 0.0
+        return {"verdict": "UNKNOWN", "score": 0.0, **usage}
 
     avg_score = sum(scores) / len(scores)
 
-    verdict = "AI-GENERATED" if avg_score > 0.7 else "REAL"
+    verdict = "AI-GENERATED" if avg_score > AI_THRESHOLD else "REAL"
 
-    return verdict, round(avg_score, 3)
+    return {"verdict": verdict, "score": round(avg_score, 3), **usage}
+
+
+def detect_ai_generated(video_path):
+    result = analyze(video_path)
+    return result["verdict"], result["score"]
@@ -0,0 +1,196 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+from PIL import Image
+
+from face_detector import cat_cascade, detect_faces, face_cascade
+from face_tracker import FaceTracker
+from frame_sampler import sample_frames
+from lazy_model import LazyModel
+from sequential import EARLY_EXIT, SequentialTest
+
+# --- Settings ---
+INFERENCE_BATCH_SIZE = int(os.environ.get("INFERENCE_BATCH_SIZE", 16))
+INFERENCE_MAX_WAIT = float(os.environ.get("INFERENCE_MAX_WAIT", 0.02))  # วินาที
+
+DETECTOR_MODEL = "prithivMLmods/Deep-Fake-Detector-v2-Model"
+FAKE_THRESHOLD = 0.55
+
+
+# โหลดโมเดลตอนใช้งานครั้งแรกเท่านั้น import โมดูลนี้จึงเร็ว
+# ตัวจับหน้าคน / หน้าแมว อยู่ใน face_detector (ใช้ร่วมกับ ai_detector)
+
+def load_detector():
+    from transformers import pipeline
+    return pipeline("image-classification", model=DETECTOR_MODEL)
+
+
+    # 3. โหลด AI
+deepfake_detector = LazyModel(load_detector, "deepfake_detector")
+
+
+def fake_score_from(results):
+    fake_score = 0.0
+    for r in results:
+        label = r["label"].upper()
+        if "FAKE" in label or "AI" in label or "0" in label:
+            fake_score = r["score"]
+            break
+        elif "REAL" in label or "HUMAN" in label or "1" in label:
+            fake_score = 1.0 - r["score"]
+    return fake_score
+
+
+class InferenceBatcher:
+    """
+    Collects face crops from any number of callers (threads) and runs them
+    through the classifier in batches of up to `batch_size`, waiting at most
+    `max_wait` seconds for a batch to fill.
+    """
+
+    def __init__(self, classify, batch_size=INFERENCE_BATCH_SIZE, max_wait=INFERENCE_MAX_WAIT):
+        self.classify = classify
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.queue = []
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def score(self, images):
+        """Return the fake score of every image, in order."""
+        futures = [Future() for _ in images]
+        with self.cond:
+            self.queue.extend(zip(images, futures))
+            self.cond.notify()
+        return [f.result() for f in futures]
+
+    def _next_batch(self):
+        with self.cond:
+            while not self.queue:
+                self.cond.wait()
+
+            # รอให้ batch เต็มไม่เกิน max_wait
+            deadline = time.monotonic() + self.max_wait
+            while len(self.queue) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+
+            batch = self.queue[:self.batch_size]
+            del self.queue[:self.batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            images = [image for image, _ in batch]
+            try:
+                outputs = self.classify(images)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), results in zip(batch, outputs):
+                future.set_result(fake_score_from(results))
+
+
+def classify_batch(images):
+    # ส่งทั้ง batch เข้า pipeline ครั้งเดียว (forward pass เดียว)
+    return deepfake_detector(images, batch_size=len(images))
+
+
+batcher = LazyModel(lambda: InferenceBatcher(classify_batch), "batcher")
+
+
+def warm_up():
+    """Load every model now instead of on the first request."""
+    face_cascade.get()
+    cat_cascade.get()
+    deepfake_detector.get()
+    batcher.get()
+
+
+# ==========================================
+# 🧠 ส่วนที่ 1: ระบบ AI (แก้บั๊ก Score แล้ว)
+# ==========================================
+
+def analyze_video(video_path, early_exit=EARLY_EXIT):
+    """
+    Returns {"verdict", "confidence", "face_scores", "tracking",
+    "frames_used", "faces_used", "early_exit", "sequential"} where
+    face_scores holds the fake score of every face crop that was classified
+    and tracking the detector / dedup counters.
+
+    Crops are scored INFERENCE_BATCH_SIZE at a time while frames are
+    read. With `early_exit`, they are also scored after each frame once
+    enough are in to decide, and sampling stops as soon as the running
+    score's confidence interval is clear of FAKE_THRESHOLD or max_samples
+    crops were scored (see SequentialTest).
+    """
+
+    pending = []
+    boxes = []
+    fake_scores = []
+    test = SequentialTest(FAKE_THRESHOLD)
+    frames_used = 0
+    stopped = False
+    # ตรวจหน้าเต็มเฟรมเป็นช่วง ๆ ระหว่างนั้นตามหน้าเดิม, หน้าซ้ำไม่ส่งเข้าโมเดล
+    tracker = FaceTracker(detect_faces)
+
+    # ~15 เฟรมกระจายทั้งคลิป, decode ต่อเนื่องแทนการ seek ทุกเฟรม
+    for i, frame in sample_frames(video_path, num_frames=15, min_step=5):
+        frames_used += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        for track_id, (x, y, w, h) in tracker.faces_to_score(gray, i):
+            face = frame[y:y+h, x:x+w]
+            rgb = cv2.cvtColor(face, cv2.COLOR_BGR2RGB)
+            pending.append(Image.fromarray(rgb))
+            boxes.append({"frame": i, "track": track_id, "box": [int(x), int(y), int(w), int(h)]})
+
+        # ส่งเข้าโมเดลเมื่อครบ batch หรือเมื่อคะแนนที่รออยู่พอให้ตัดสินได้แล้ว
+        # (FaceTracker ให้ไม่กี่ crop ต่อหน้า รอครบ batch ก็ไม่ได้หยุดก่อน)
+        if len(pending) < INFERENCE_BATCH_SIZE and not (early_exit and test.could_stop(len(pending))):
+            continue
+        if early_exit:
+            del pending[test.room(len(pending)):]  # ไม่เกิน max_samples
+        scores = batcher.get().score(pending)
+        pending = []
+        fake_scores.extend(scores)
+        test.add_many(scores)
+        if early_exit and test.done():
+            stopped = True
+            break
+
+    if early_exit:
+        del pending[test.room(len(pending)):]
+    if pending:
+        scores = batcher.get().score(pending)
+        fake_scores.extend(scores)
+        test.add_many(scores)
+
+    face_scores = [
+        {**box, "score": round(score, 4)}
+        for box, score in zip(boxes, fake_scores)
+    ]
+    usage = {
+        "tracking": tracker.stats,
+        "frames_used": frames_used,
+        "faces_used": len(fake_scores),
+        "early_exit": stopped,
+        "sequential": test.summary(),
+    }
+
+    if not fake_scores:
+        return {"verdict": "REAL", "confidence": 50.0, "face_scores": [], **usage}
+
+    avg = sum(fake_scores) / len(fake_scores)
+    if avg > FAKE_THRESHOLD:
+        return {"verdict": "FAKE", "confidence": round(avg * 100, 2), "face_scores": face_scores, **usage}
+
+    return {"verdict": "REAL", "confidence": round((1.0 - avg) * 100, 2), "face_scores": face_scores, **usage}
@@ -0,0 +1,60 @@
+"""
+Per-item hybrid_consensus vs. vectorised batch_hybrid_consensus.
+
+    python benchmarks/consensus.py [items] [nodes]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from consensus import batch_hybrid_consensus, hybrid_consensus, votes_to_matrix  # noqa: E402
+
+
+def make_items(count, nodes, seed=0):
+    rng = random.Random(seed)
+    names = [f"node{i}" for i in range(nodes)]
+    items = []
+    for _ in range(count):
+        voters = rng.sample(names, rng.randint(0, nodes))
+        items.append({
+            "verdict": rng.choice(["REAL", "FAKE", "UNCERTAIN"]),
+            "confidence": round(rng.uniform(50, 100), 2),
+            "votes": [{"node": n, "vote": rng.choice(["REAL", "FAKE"])} for n in voters],
+        })
+    return items, names
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    nodes = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    items, names = make_items(count, nodes)
+
+    t = time.perf_counter()
+    single = [hybrid_consensus(i["verdict"], i["confidence"], i["votes"]) for i in items]
+    t_single = time.perf_counter() - t
+
+    t = time.perf_counter()
+    matrix, _ = votes_to_matrix([i["votes"] for i in items], names)
+    t_matrix = time.perf_counter() - t
+
+    t = time.perf_counter()
+    batch = batch_hybrid_consensus(
+        [i["verdict"] for i in items], [i["confidence"] for i in items], matrix
+    )
+    t_batch = time.perf_counter() - t
+
+    agree = np.array([s["final_result"] == "REAL" for s in single]) == batch["final_result"]
+    print(f"items: {count}, nodes: {nodes}")
+    print(f"per-item hybrid_consensus   {t_single * 1000:9.2f} ms")
+    print(f"build vote matrix           {t_matrix * 1000:9.2f} ms")
+    print(f"batch_hybrid_consensus      {t_batch * 1000:9.2f} ms  ({t_single / t_batch:.1f}x)")
+    print(f"same final_result           {agree.mean() * 100:.2f}%")
+
+
+if __name__ == "__main__":
+    main()
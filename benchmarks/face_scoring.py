@@ -0,0 +1,87 @@
+"""
+Faces/sec of the ResNet deepfake scorer in ai_detector.
+
+Compares the old per-face loop (ToPILImage -> Resize -> ToTensor, batch of
+one, .item() per face) with score_faces (OpenCV resize into a reused
+NumPy buffer, torch.from_numpy, one batched forward pass under
+inference_mode). Face crops are cut from frames of a real video.
+
+    python benchmarks/face_scoring.py [faces] [threads]
+"""
+import copy
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cv2  # noqa: E402
+import torch  # noqa: E402
+from torchvision import transforms  # noqa: E402
+
+import ai_detector  # noqa: E402
+from video_utils import iter_frames  # noqa: E402
+
+old_transform = transforms.Compose([
+    transforms.ToPILImage(),
+    transforms.Resize((299, 299)),
+    transforms.ToTensor(),
+])
+
+
+def old_loop(faces, net):
+    scores = []
+    for face in faces:
+        face = cv2.cvtColor(face, cv2.COLOR_BGR2RGB)
+        x = old_transform(face).unsqueeze(0)
+        with torch.no_grad():
+            output = net(x)
+            scores.append(torch.sigmoid(output).item())
+    return scores
+
+
+def make_faces(count, seed=0):
+    rng = random.Random(seed)
+    frames = list(iter_frames(os.path.join(ROOT, "uploads", "test2.mp4"), max_frames=30))
+    faces = []
+    for _ in range(count):
+        frame = rng.choice(frames)
+        size = rng.randint(60, 240)
+        y = rng.randint(0, frame.shape[0] - size)
+        x = rng.randint(0, frame.shape[1] - size)
+        faces.append(frame[y:y + size, x:x + size])
+    return faces
+
+
+def timed(fn, faces):
+    t = time.perf_counter()
+    scores = fn(faces)
+    return scores, time.perf_counter() - t
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    if len(sys.argv) > 2:
+        torch.set_num_threads(int(sys.argv[2]))
+    faces = make_faces(count)
+
+    # โมเดลเดิม (layout ปกติ) สำหรับ loop เก่า น้ำหนักเดียวกัน
+    old_net = copy.deepcopy(ai_detector.model.get()).to(memory_format=torch.contiguous_format)
+    ai_detector.score_faces(faces[:2])  # warm-up
+    old_loop(faces[:2], old_net)
+
+    old, t_old = timed(lambda f: old_loop(f, old_net), faces)
+    new, t_new = timed(ai_detector.score_faces, faces)
+    drift = max(abs(a - b) for a, b in zip(old, new))
+
+    batch = ai_detector.FACE_BATCH_SIZE or ai_detector.default_batch_size()
+    print(f"faces: {count}, torch threads: {torch.get_num_threads()}, batch: {batch}")
+    print(f"per-face loop      {count / t_old:8.1f} faces/s  ({t_old:.2f} s)")
+    print(f"batched tensor     {count / t_new:8.1f} faces/s  ({t_new:.2f} s)  {t_old / t_new:.1f}x")
+    print(f"max score difference: {drift:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Detector / classifier calls per video with and without face tracking.
+
+Runs Haar detection on every frame (old path) and through FaceTracker
+(periodic detection + template tracking + dHash dedup) over the same
+consecutive frames, and reports detector calls, crops to classify and time.
+
+    python benchmarks/face_tracking.py [video] [frames]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cv2  # noqa: E402
+
+from face_tracker import FaceTracker  # noqa: E402
+from face_utils import detect_face_boxes  # noqa: E402
+from video_utils import iter_frames  # noqa: E402
+
+
+def main():
+    video = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "uploads", "test2.mp4")
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    grays = [cv2.cvtColor(f, cv2.COLOR_BGR2GRAY) for f in iter_frames(video, max_frames=count)]
+    detect_face_boxes(grays[0])  # โหลด cascade ก่อนจับเวลา
+
+    t = time.perf_counter()
+    crops = sum(len(detect_face_boxes(g)) for g in grays)
+    t_every = time.perf_counter() - t
+
+    tracker = FaceTracker(detect_face_boxes)
+    t = time.perf_counter()
+    scored = sum(len(tracker.faces_to_score(g)) for g in grays)
+    t_tracked = time.perf_counter() - t
+
+    print(f"video: {os.path.basename(video)}, frames: {len(grays)}")
+    print(f"{'':22}{'detector calls':>16}{'crops scored':>14}{'seconds':>10}")
+    print(f"{'detect every frame':22}{len(grays):16}{crops:14}{t_every:10.2f}")
+    print(f"{'FaceTracker':22}{tracker.stats['detections']:16}{scored:14}{t_tracked:10.2f}")
+    print(f"tracked: {tracker.stats['tracked']}, duplicates skipped: {tracker.stats['duplicates']}")
+
+
+if __name__ == "__main__":
+    main()
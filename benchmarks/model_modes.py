@@ -0,0 +1,64 @@
+"""
+Latency, throughput and accuracy drift of each DETECTOR_MODE.
+
+For fp32, torchscript and int8 (model_export.MODES) reports load time
+(build on the first run, cache afterwards), single-face latency, batched
+throughput, and score drift against fp32 on the fixed sample set.
+
+    python benchmarks/model_modes.py [modes...] [--threads N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import torch  # noqa: E402
+
+import model_export  # noqa: E402
+
+
+def latency_ms(net, sample, runs):
+    times = []
+    with torch.inference_mode():
+        net(sample)
+        for _ in range(runs):
+            t = time.perf_counter()
+            net(sample)
+            times.append(time.perf_counter() - t)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modes", nargs="*", default=list(model_export.MODES))
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=8)
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    samples = model_export.sample_set()
+    reference = model_export.load_fp32()
+
+    print(f"torch {torch.__version__}, threads {torch.get_num_threads()}, samples {len(samples)}")
+    print(f"{'mode':12}{'load s':>8}{'1-face ms':>11}{'faces/s':>9}{'max drift':>11}{'mean drift':>12}{'agree':>7}")
+    for mode in args.modes:
+        t = time.perf_counter()
+        net = model_export.load_detector(mode)
+        loaded = time.perf_counter() - t
+
+        single = latency_ms(net, samples[:1], args.runs)
+        batch = samples[:args.batch]
+        throughput = args.batch / (latency_ms(net, batch, max(1, args.runs // 2)) / 1000)
+        drift = model_export.drift_check(reference, net, samples)
+        print(f"{mode:12}{loaded:8.1f}{single:11.1f}{throughput:9.1f}"
+              f"{drift['max_abs']:11.4f}{drift['mean_abs']:12.4f}{drift['verdict_agreement']:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Startup-time benchmark for server.py.
+
+Measures, in a fresh interpreter, how long `import server` takes and how
+long until /chain, /nodes and /register_node answer their first request.
+Runs against a copy of the repo's data files in a temp directory.
+
+    python benchmarks/startup.py
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+import server
+t_import = time.perf_counter() - t0
+
+client = server.app.test_client()
+timings = {"import server": t_import}
+for name, call in [
+    ("GET /chain", lambda: client.get("/chain")),
+    ("GET /nodes", lambda: client.get("/nodes")),
+    ("POST /register_node", lambda: client.post("/register_node", json={"node": "bench"},
+                                                 environ_base={"REMOTE_ADDR": "10.9.9.9"})),
+]:
+    t = time.perf_counter()
+    status = call().status_code
+    timings[name] = time.perf_counter() - t
+    timings[name + " status"] = status
+timings["total to first responses"] = time.perf_counter() - t0
+print(json.dumps(timings))
+"""
+
+
+def main():
+    tmp = tempfile.mkdtemp(prefix="startup-bench-")
+    try:
+        for name in ("blockchain.json", "nodes.json", "users.json"):
+            src = os.path.join(ROOT, name)
+            if os.path.exists(src):
+                shutil.copy(src, tmp)
+
+        env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=tmp, env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        timings = json.loads(out.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    for name, value in timings.items():
+        if name.endswith("status"):
+            continue
+        print(f"{name:<28} {value * 1000:9.1f} ms   {timings.get(name + ' status', '')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,24 +2,111 @@ import json
 import os
 import time
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from chain_store import BlockLog
+from merkle import merkle_root, merkle_proof
+
+# เวลาของ genesis ใน blockchain.json ที่มากับ repo
+GENESIS_TIMESTAMP = 1765821906.2446282
+
+
+def block_header(block):
+    """Everything except the records and the block's own hash."""
+    return {k: v for k, v in block.items() if k not in ("hash", "data")}
+
+
+def block_records(block):
+    """Verification records of a block (old blocks hold a single dict)."""
+    data = block["data"]
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        return [data]
+    return []  # genesis
+
+
+def calculate_hash(block):
+    if "merkle_root" in block:
+        # block แบบใหม่: hash เฉพาะ header, records ผูกผ่าน merkle_root
+        block_copy = block_header(block)
+    else:
+        block_copy = block.copy()
+        block_copy.pop("hash", None)  # ห้ามเอา hash ตัวเองมาคิด
+    encoded = json.dumps(block_copy, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def check_blocks(blocks, prev_hash):
+    """
+    Check a contiguous run of blocks whose predecessor has hash `prev_hash`.
+    Each block is hashed exactly once. Returns (index, reason) of the first
+    bad block, or None.
+    """
+    for block in blocks:
+        if block["previous_hash"] != prev_hash:
+            return block["index"], "previous_hash mismatch"
+        if block["hash"] != calculate_hash(block):
+            return block["index"], "hash mismatch"
+        if "merkle_root" in block and block["merkle_root"] != merkle_root(block["data"]):
+            return block["index"], "merkle_root mismatch"
+        prev_hash = block["hash"]
+    return None
+
+
+def check_suffix(blocks, start, prev_hash):
+    """
+    Check blocks received from a peer, which should start at index `start`
+    and link to `prev_hash`. The genesis block is never replaced, so
+    `start` must be at least 1. Raises ValueError on the first bad block.
+    """
+    if not blocks:
+        raise ValueError("no blocks")
+    if start < 1:
+        raise ValueError("blocks must not replace the genesis block")
+    for i, block in enumerate(blocks):
+        if block.get("index") != start + i:
+            raise ValueError(f"expected block {start + i}, got {block.get('index')}")
+    bad = check_blocks(blocks, prev_hash)
+    if bad is not None:
+        raise ValueError(f"invalid block {bad[0]}: {bad[1]}")
+
+
+def _check_chunk(args):
+    blocks, prev_hash = args
+    return check_blocks(blocks, prev_hash)
 
 
 class Blockchain:
-    def __init__(self, filename="blockchain.json"):
+    def __init__(self, filename="blockchain.json", log_dir="chain_log"):
+        # filename = ไฟล์ JSON แบบเดิม ใช้สำหรับ import / export เท่านั้น
+        # block จริงเก็บใน append-only log ที่ log_dir
         self.filename = filename
+        self.log = BlockLog(log_dir)
+
+        # secondary index: video_hash -> (index, position),
+        # uploader / verdict -> [(index, position)]
+        self.video_index = {}
+        self.uploader_index = {}
+        self.verdict_index = {}
 
-        if os.path.exists(self.filename) and os.path.getsize(self.filename) > 0:
-            with open(self.filename, "r") as f:
-                self.chain = json.load(f)
+        if not self.log.is_empty():
+            self.chain = self.log.load()
+        elif os.path.exists(self.filename) and os.path.getsize(self.filename) > 0:
+            # ย้ายข้อมูลจาก blockchain.json เดิมเข้า log ครั้งแรก
+            self.import_json(self.filename)
         else:
             self.chain = []
             self.create_genesis_block()
-            self.save_chain()
+            self.log.append(self.chain[-1])
+
+        self.rebuild_indexes()
 
     def create_genesis_block(self):
+        # genesis เดียวกันทุก node (ตรงกับ blockchain.json ที่มากับ repo) ไม่งั้น sync กันไม่ได้
         block = {
             "index": 0,
-            "timestamp": time.time(),
+            "timestamp": GENESIS_TIMESTAMP,
             "data": "Genesis Block",
             "previous_hash": "0",
         }
@@ -27,21 +114,91 @@ class Blockchain:
         self.chain.append(block)
 
     def calculate_hash(self, block):
-        # block_copy = block.copy()
-        # block_copy.pop("hash", None)
-        # block_string = json.dumps(block_copy, sort_keys=True).encode()
-        # return hashlib.sha256(block_string).hexdigest()
-        block_copy = block.copy()
-        block_copy.pop("hash", None)  # ห้ามเอา hash ตัวเองมาคิด
-        encoded = json.dumps(block_copy, sort_keys=True).encode()
-        return hashlib.sha256(encoded).hexdigest()
+        return calculate_hash(block)
 
 
     def get_last_block(self):
         return self.chain[-1]
 
-    def create_block(self, data):
+    # ---------- indexes ----------
+
+    def rebuild_indexes(self):
+        self.video_index = {}
+        self.uploader_index = {}
+        self.verdict_index = {}
+        for block in self.chain:
+            self._index_block(block)
+
+    def _index_block(self, block):
+        index = block["index"]
+
+        for position, data in enumerate(block_records(block)):
+            if "video_hash" in data:
+                self.video_index[data["video_hash"]] = (index, position)
+            if "uploader" in data:
+                self.uploader_index.setdefault(data["uploader"], []).append((index, position))
+
+            verdict = data.get("final_result", data.get("verdict"))
+            if verdict is not None:
+                self.verdict_index.setdefault(verdict, []).append((index, position))
+
+    def get_block(self, index):
+        if 0 <= index < len(self.chain):
+            return self.chain[index]
+        return None
+
+    def find_record(self, video_hash):
+        """Returns (block, position, record) or None."""
+        found = self.video_index.get(video_hash)
+        if found is None:
+            return None
+        block = self.chain[found[0]]
+        return block, found[1], block_records(block)[found[1]]
+
+    def prove(self, video_hash):
+        """
+        Merkle inclusion proof for the record of `video_hash`. A light
+        client checks it against the block header alone.
+        """
+        found = self.find_record(video_hash)
+        if found is None:
+            return None
+        block, position, record = found
+        if "merkle_root" not in block:
+            return {"record": record, "header": None, "proof": None, "block_hash": block["hash"]}
+        return {
+            "record": record,
+            "position": position,
+            "proof": merkle_proof(block["data"], position),
+            "header": block_header(block),
+            "block_hash": block["hash"],
+        }
+
+    def _records_at(self, locations):
+        found = []
+        for index, position in locations:
+            block = self.chain[index]
+            found.append({
+                "block_index": index,
+                "position": position,
+                "block_hash": block["hash"],
+                "record": block_records(block)[position],
+            })
+        return found
+
+    def records_by_uploader(self, uploader):
+        """Records uploaded by `uploader`, with their (block_index, position)."""
+        return self._records_at(self.uploader_index.get(uploader, []))
+
+    def records_by_verdict(self, verdict):
+        """Records whose final (or AI) verdict is `verdict`, with their (block_index, position)."""
+        return self._records_at(self.verdict_index.get(verdict, []))
+
+    def create_block(self, records):
+        """Append one block holding a list of verification records."""
         prev_block = self.chain[-1]
+        if isinstance(records, dict):
+            records = [records]
 
         # block = {
         #     "index": last_block["index"] + 1,
@@ -52,34 +209,153 @@ class Blockchain:
         block = {
         "index": len(self.chain),
         "timestamp": time.time(),
-        "data": data,
-        "previous_hash": self.calculate_hash(prev_block)
+        "data": records,
+        "merkle_root": merkle_root(records),
+        "tx_count": len(records),
+        "previous_hash": prev_block["hash"]
         }
 
         block["hash"] = self.calculate_hash(block)
         self.chain.append(block)
-        self.save_chain()
+        self.log.append(block)
+        self._index_block(block)
         return block
 
+    def replace_from(self, start, blocks, checked=False):
+        """
+        Replace everything from index `start` on with `blocks` (a suffix
+        fetched from a peer). The blocks must link to `chain[start - 1]`;
+        the genesis block (start 0) is never replaced. Pass `checked=True`
+        when the blocks already went through `check_suffix`. Returns the
+        local blocks that were dropped.
+        """
+        if start < 1:
+            raise ValueError("blocks must not replace the genesis block")
+        if not checked:
+            check_suffix(blocks, start, self.chain[start - 1]["hash"])
+
+        dropped = self.chain[start:]
+        if dropped:
+            self.log.truncate(start)
+        self.chain = self.chain[:start] + list(blocks)
+        self.log.append_many(blocks)
+
+        if dropped:
+            self.rebuild_indexes()
+        else:
+            for block in blocks:
+                self._index_block(block)
+        return dropped
+
     def save_chain(self):
-        with open(self.filename, "w") as f:
+        self.export_json(self.filename)
+
+    def export_json(self, filename):
+        tmp = filename + ".tmp"
+        with open(tmp, "w") as f:
             json.dump(self.chain, f, indent=2)
+        os.replace(tmp, filename)
+
+    def import_json(self, filename):
+        with open(filename, "r") as f:
+            self.chain = json.load(f)
+        self.log.reset(self.chain)
+        self.rebuild_indexes()
+
+    # ---------- validation ----------
+
+    def _checkpoint_path(self):
+        return os.path.join(self.log.directory, "checkpoint.json")
+
+    def load_checkpoint(self):
+        path = self._checkpoint_path()
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def save_checkpoint(self, index, block_hash):
+        path = self._checkpoint_path()
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"index": index, "hash": block_hash}, f)
+        os.replace(tmp, path)
 
     def is_chain_valid(self):
-        for i in range(1, len(self.chain)):
-            curr = self.chain[i]
-            prev = self.chain[i - 1]
+        """
+        Incremental check: only blocks after the persisted checkpoint
+        ("verified up to index N / hash H") are hashed. The checkpoint is
+        advanced when the new blocks are valid.
+        """
+        checkpoint = self.load_checkpoint()
+        start = 0
 
-            if curr["previous_hash"] != self.calculate_hash(prev):
-                return False
+        if checkpoint is not None:
+            index = checkpoint["index"]
+            # checkpoint ต้องยังตรงกับ chain ปัจจุบัน ไม่งั้นตรวจใหม่ทั้งหมด
+            if index < len(self.chain) and self.chain[index]["hash"] == checkpoint["hash"]:
+                start = index + 1
 
-            if curr["hash"] != self.calculate_hash(curr):
+        if start == 0:
+            genesis = self.chain[0]
+            if genesis["hash"] != self.calculate_hash(genesis):
                 return False
+            start = 1
+
+        prev_hash = self.chain[start - 1]["hash"]
+        if check_blocks(self.chain[start:], prev_hash) is not None:
+            return False
 
+        tip = self.chain[-1]
+        if checkpoint is None or checkpoint["index"] != tip["index"]:
+            self.save_checkpoint(tip["index"], tip["hash"])
         return True
 
+    def audit_chain(self, workers=None, chunk_size=5000):
+        """
+        Full re-validation of every block, split into chunks hashed across a
+        process pool. Returns a report with the first bad index (or None).
+        """
+        started = time.time()
+        chain = self.chain
 
+        first_bad = None
+        reason = None
 
+        genesis = chain[0]
+        if genesis["hash"] != calculate_hash(genesis):
+            first_bad, reason = 0, "hash mismatch"
+        else:
+            jobs = [
+                (chain[i:i + chunk_size], chain[i - 1]["hash"])
+                for i in range(1, len(chain), chunk_size)
+            ]
+            if len(jobs) <= 1:
+                results = [_check_chunk(job) for job in jobs]
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(_check_chunk, jobs))
 
+            # chunk ถูกส่งกลับตามลำดับ อันแรกที่เจอคือ index แรกที่เสีย
+            for result in results:
+                if result is not None:
+                    first_bad, reason = result
+                    break
 
+        if first_bad is None:
+            tip = chain[-1]
+            self.save_checkpoint(tip["index"], tip["hash"])
+        elif first_bad > 0:
+            # ถอย checkpoint กลับไปก่อน block ที่เสีย
+            good = chain[first_bad - 1]
+            self.save_checkpoint(good["index"], good["hash"])
+        elif os.path.exists(self._checkpoint_path()):
+            os.remove(self._checkpoint_path())
 
+        return {
+            "valid": first_bad is None,
+            "blocks": len(chain),
+            "first_bad_index": first_bad,
+            "reason": reason,
+            "seconds": round(time.time() - started, 3),
+        }
@@ -0,0 +1,179 @@
+import json
+import os
+
+
+class BlockLog:
+    """
+    Append-only block storage.
+
+    Blocks are written one per line (JSON-lines) into numbered segment files
+    inside `directory`. Every append is flushed and fsync'd, so a crash can at
+    most leave a half-written last line, which is dropped on the next load.
+    A small header file (`index.json`) lists the segments and the index of
+    the first block in each one; it is only rewritten on segment rollover.
+    """
+
+    HEADER_FILE = "index.json"
+
+    def __init__(self, directory="chain_log", max_segment_blocks=1000):
+        self.directory = directory
+        self.max_segment_blocks = max_segment_blocks
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.header = self._read_header()
+        self._file = None
+
+    # ---------- header ----------
+
+    def _header_path(self):
+        return os.path.join(self.directory, self.HEADER_FILE)
+
+    def _read_header(self):
+        path = self._header_path()
+        if not os.path.exists(path):
+            return {"version": 1, "segments": []}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _write_header(self):
+        # เขียนไฟล์ชั่วคราวแล้ว rename เพื่อไม่ให้ header เสียตอน crash
+        path = self._header_path()
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.header, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, segment["file"])
+
+    # ---------- read ----------
+
+    def is_empty(self):
+        return not self.header["segments"]
+
+    def __iter__(self):
+        """Stream blocks from disk one at a time."""
+        for segment in self.header["segments"]:
+            path = self._segment_path(segment)
+            if not os.path.exists(path):
+                continue
+            with open(path, "r") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        # บรรทัดสุดท้ายเขียนไม่จบ (crash ระหว่าง append)
+                        break
+                    yield json.loads(line)
+
+    def load(self):
+        blocks = list(self)
+        self._repair(blocks)
+        return blocks
+
+    def _repair(self, blocks):
+        # ตัดบรรทัดที่เขียนไม่สมบูรณ์ทิ้ง และนับจำนวน block ใหม่จากของจริง
+        if not self.header["segments"]:
+            return
+        last = self.header["segments"][-1]
+        path = self._segment_path(last)
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        good = data[: data.rfind(b"\n") + 1]
+        if len(good) != len(data):
+            with open(path, "wb") as f:
+                f.write(good)
+                f.flush()
+                os.fsync(f.fileno())
+        last["count"] = len(blocks) - last["start"]
+        self._write_header()
+
+    # ---------- write ----------
+
+    def _open_segment(self, start_index):
+        self.close()
+        segment = {
+            "file": f"segment_{len(self.header['segments']):06d}.jsonl",
+            "start": start_index,
+            "count": 0,
+        }
+        self.header["segments"].append(segment)
+        self._write_header()
+        return segment
+
+    def _current_segment(self, next_index):
+        segments = self.header["segments"]
+        if not segments or segments[-1]["count"] >= self.max_segment_blocks:
+            return self._open_segment(next_index)
+        return segments[-1]
+
+    def append(self, block):
+        self.append_many([block])
+
+    def append_many(self, blocks):
+        """Append blocks with a single fsync per touched segment."""
+        for block in blocks:
+            segment = self._current_segment(block["index"])
+            if self._file is None or self._file.name != self._segment_path(segment):
+                self.close()
+                self._file = open(self._segment_path(segment), "a")
+            self._file.write(json.dumps(block, sort_keys=True) + "\n")
+            segment["count"] += 1
+
+            if segment["count"] >= self.max_segment_blocks:
+                self._sync()
+
+        self._sync()
+
+    def _sync(self):
+        if self._file is None:
+            return
+        # header จะถูกเขียนเฉพาะตอนเปิด segment ใหม่ จำนวน block ของ
+        # segment สุดท้ายนับใหม่ตอนโหลด
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def truncate(self, count):
+        """Keep only the first `count` blocks (used when switching forks)."""
+        self.close()
+        keep = []
+        for segment in self.header["segments"]:
+            path = self._segment_path(segment)
+            if segment["start"] >= count:
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            keep.append(segment)
+            if segment["start"] + segment["count"] > count:
+                with open(path, "r") as f:
+                    lines = f.readlines()[: count - segment["start"]]
+                tmp = path + ".tmp"
+                with open(tmp, "w") as f:
+                    f.writelines(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, path)
+                segment["count"] = len(lines)
+        self.header["segments"] = keep
+        self._write_header()
+
+    # ---------- import / export ----------
+
+    def reset(self, blocks):
+        """Replace the whole log with `blocks` (used for JSON import)."""
+        self.close()
+        for segment in self.header["segments"]:
+            path = self._segment_path(segment)
+            if os.path.exists(path):
+                os.remove(path)
+        self.header = {"version": 1, "segments": []}
+        self._write_header()
+        if blocks:
+            self.append_many(blocks)
@@ -0,0 +1,151 @@
+import os
+
+import numpy as np
+
+# รหัสโหวตใน vote matrix
+VOTE_FAKE = 0
+VOTE_REAL = 1
+NO_VOTE = -1
+
+
+class ConsensusPolicy:
+    """Weights of the AI and human scores and the REAL threshold."""
+
+    def __init__(self, ai_weight=0.6, human_weight=0.4, threshold=0.7):
+        self.ai_weight = ai_weight
+        self.human_weight = human_weight
+        self.threshold = threshold
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            ai_weight=float(os.environ.get("CONSENSUS_AI_WEIGHT", 0.6)),
+            human_weight=float(os.environ.get("CONSENSUS_HUMAN_WEIGHT", 0.4)),
+            threshold=float(os.environ.get("CONSENSUS_THRESHOLD", 0.7)),
+        )
+
+    def to_dict(self):
+        return {
+            "ai_weight": self.ai_weight,
+            "human_weight": self.human_weight,
+            "threshold": self.threshold,
+        }
+
+
+DEFAULT_POLICY = ConsensusPolicy()
+
+
+def hybrid_consensus(ai_verdict, ai_confidence, votes, policy=DEFAULT_POLICY):
+    """
+    ai_verdict: 'REAL' | 'FAKE' | 'UNCERTAIN'
+    ai_confidence: 0 - 100
+    votes: [{node, vote}]
+    """
+
+    # -------- AI SCORE (60%) --------
+    if ai_verdict == "REAL":
+        ai_score = ai_confidence / 100
+    elif ai_verdict == "FAKE":
+        ai_score = 1 - (ai_confidence / 100)
+    else:  # UNCERTAIN
+        ai_score = 0.5
+
+    ai_weighted = ai_score * policy.ai_weight
+
+    # -------- HUMAN SCORE (40%) --------
+    if not votes:
+        human_score = 0.5
+    else:
+        agree = sum(1 for v in votes if v["vote"] == "REAL")
+        human_score = agree / len(votes)
+
+    human_weighted = human_score * policy.human_weight
+
+    # -------- FINAL --------
+    final_score = ai_weighted + human_weighted
+    final_result = "REAL" if final_score > policy.threshold else "FAKE"
+
+    # return final_result, round(final_score, 3)
+    return {
+        "ai_score": round(ai_score, 3),
+        "ai_weight": ai_weighted,
+        "ai_weighted": round(ai_weighted, 3),
+
+        "human_score": round(human_score, 3),
+        "human_weight": human_weighted,
+        "human_weighted": round(human_weighted, 3),
+
+        "final_score": round(final_score, 3),
+        "final_result": final_result
+    }
+
+
+def votes_to_matrix(vote_lists, nodes=None):
+    """
+    Build an (items x nodes) int8 matrix from per-item [{node, vote}]
+    lists: 1 = REAL, 0 = FAKE, -1 = did not vote.
+    """
+    if nodes is None:
+        nodes = sorted({v["node"] for votes in vote_lists for v in votes})
+    column = {n: i for i, n in enumerate(nodes)}
+
+    matrix = np.full((len(vote_lists), max(1, len(nodes))), NO_VOTE, dtype=np.int8)
+    for row, votes in enumerate(vote_lists):
+        for v in votes:
+            matrix[row, column[v["node"]]] = VOTE_REAL if v["vote"] == "REAL" else VOTE_FAKE
+    return matrix, nodes
+
+
+def batch_hybrid_consensus(ai_verdicts, ai_confidences, vote_matrix, policy=DEFAULT_POLICY):
+    """
+    Vectorised hybrid_consensus over many pending items at once.
+
+    ai_verdicts: sequence of 'REAL' / 'FAKE' / other (uncertain)
+    ai_confidences: 0 - 100 per item
+    vote_matrix: (items x nodes) of 1 / 0 / -1 as built by votes_to_matrix
+
+    Returns a dict of arrays: ai_score, human_score, final_score,
+    final_result (bool array, True = REAL).
+    """
+    verdicts = np.asarray(ai_verdicts)
+    confidence = np.asarray(ai_confidences, dtype=np.float64) / 100
+    votes = np.asarray(vote_matrix)
+
+    ai_score = np.where(
+        verdicts == "REAL", confidence,
+        np.where(verdicts == "FAKE", 1 - confidence, 0.5),
+    )
+
+    voted = (votes != NO_VOTE).sum(axis=1)
+    real = (votes == VOTE_REAL).sum(axis=1)
+    human_score = np.divide(real, voted, out=np.full(len(voted), 0.5), where=voted > 0)
+
+    final_score = ai_score * policy.ai_weight + human_score * policy.human_weight
+    return {
+        "ai_score": ai_score,
+        "human_score": human_score,
+        "final_score": final_score,
+        "final_result": final_score > policy.threshold,
+    }
+
+
+def batch_results_to_dicts(results, policy=DEFAULT_POLICY):
+    """Per-item dicts in the same shape hybrid_consensus returns."""
+    out = []
+    for ai_score, human_score, final_score, is_real in zip(
+        results["ai_score"].tolist(), results["human_score"].tolist(),
+        results["final_score"].tolist(), results["final_result"].tolist(),
+    ):
+        ai_weighted = ai_score * policy.ai_weight
+        human_weighted = human_score * policy.human_weight
+        out.append({
+            "ai_score": round(ai_score, 3),
+            "ai_weight": ai_weighted,
+            "ai_weighted": round(ai_weighted, 3),
+            "human_score": round(human_score, 3),
+            "human_weight": human_weighted,
+            "human_weighted": round(human_weighted, 3),
+            "final_score": round(final_score, 3),
+            "final_result": "REAL" if is_real else "FAKE",
+        })
+    return out
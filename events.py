@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import deque
+
+EVENT_BUFFER_SIZE = 1000
+
+
+class EventBus:
+    """
+    Publish / subscribe for consensus events.
+
+    Every event gets an increasing id and is kept in a bounded buffer, so
+    remote clients (SSE / long-poll) can resume from the last id they saw.
+    In-process callbacks can also subscribe.
+
+    Ids start from the bus's start time (ms * 1000), so after a restart
+    they are still above any id from the previous run. A cursor from
+    before this run (or one it never issued) is reported as incomplete.
+    """
+
+    def __init__(self, buffer_size=EVENT_BUFFER_SIZE):
+        self.subscribers = []
+        self.buffer = deque(maxlen=buffer_size)
+        self.first_id = int(time.time() * 1000) * 1000
+        self.last_id = self.first_id
+        self.cond = threading.Condition()
+
+    def subscribe(self, callback):
+        with self.cond:
+            self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self.cond:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def publish(self, event_type, payload):
+        with self.cond:
+            self.last_id += 1
+            event = {"id": self.last_id, "type": event_type, "time": time.time(), "data": payload}
+            self.buffer.append(event)
+            subscribers = list(self.subscribers)
+            self.cond.notify_all()
+
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"[events] subscriber failed on {event_type}: {e}")
+        return event
+
+    def since(self, last_id):
+        """
+        Returns (events after last_id, complete). complete is False when
+        some of those events already fell out of the buffer.
+        """
+        with self.cond:
+            return self._since(last_id)
+
+    def is_current(self, last_id):
+        return self.first_id <= last_id <= self.last_id
+
+    def _since(self, last_id):
+        if not self.is_current(last_id):
+            # cursor ของรอบก่อน restart: ส่งทุก event ที่ยังมี แล้วให้ client reset
+            return list(self.buffer), False
+        events = [e for e in self.buffer if e["id"] > last_id]
+        oldest = self.buffer[0]["id"] if self.buffer else self.last_id + 1
+        complete = last_id >= oldest - 1 or last_id >= self.last_id
+        return events, complete
+
+    def wait(self, last_id, timeout):
+        """Block until there is an event after last_id or timeout passes."""
+        with self.cond:
+            if self.is_current(last_id):
+                self.cond.wait_for(lambda: self.last_id > last_id, timeout=timeout)
+            return self._since(last_id)
@@ -0,0 +1,84 @@
+import os
+
+import cv2
+
+from lazy_model import LazyModel
+
+# --- Settings ---
+FACE_DETECT_WIDTH = int(os.environ.get("FACE_DETECT_WIDTH", 640))   # 0 = ตรวจที่ความละเอียดเต็ม
+FACE_REFINE = os.environ.get("FACE_REFINE", "0") == "1"
+MIN_FACE = 60            # พิกเซล ที่ความละเอียดเต็ม
+CASCADE_WINDOW = 24      # ขนาดหน้าต่างเล็กสุดของ haarcascade_frontalface
+REFINE_MARGIN = 0.25
+
+
+# cascade ชุดเดียวใช้ร่วมกันทั้ง analyzer, face_utils และ ai_detector
+# โหลดตอนใช้งานครั้งแรกเท่านั้น
+
+def lazy_cascade(name):
+    return LazyModel(lambda: cv2.CascadeClassifier(cv2.data.haarcascades + name), name)
+
+
+face_cascade = lazy_cascade("haarcascade_frontalface_default.xml")
+cat_cascade = lazy_cascade("haarcascade_frontalcatface.xml")
+
+
+def detect_faces(gray, min_neighbors=4, scale_factor=1.1, min_size=MIN_FACE,
+                 target_width=FACE_DETECT_WIDTH, refine=FACE_REFINE):
+    """
+    Face boxes (x, y, w, h) in full-resolution coordinates.
+
+    Frames wider than `target_width` are downscaled before the cascade runs
+    (cost grows with pixel count, so 1080p / 4K frames get much cheaper);
+    boxes are scaled back up. The downscale stops where a `min_size` face
+    still covers the cascade's 24 px window, so no face the full-resolution
+    pass would find is too small to detect. With `refine`, each box is
+    re-detected in a small full-resolution ROI around it for a tighter fit.
+    """
+    height, width = gray.shape[:2]
+    scale = 1.0
+    small = gray
+    if target_width and width > target_width:
+        # ย่อได้ไม่เกินจุดที่หน้าขนาด min_size ยังเท่ากับหน้าต่าง cascade
+        scale = min(1.0, max(target_width / width, CASCADE_WINDOW / min_size))
+    if scale < 1.0:
+        small = cv2.resize(gray, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+    small_min = max(CASCADE_WINDOW, int(min_size * scale))
+    found = face_cascade.get().detectMultiScale(
+        small,
+        scaleFactor=scale_factor,
+        minNeighbors=min_neighbors,
+        minSize=(small_min, small_min)
+    )
+
+    boxes = []
+    for (x, y, w, h) in found:
+        box = (round(x / scale), round(y / scale), round(w / scale), round(h / scale))
+        if refine and scale < 1.0:
+            box = refine_box(gray, box, scale_factor, min_neighbors)
+        if box[2] >= min_size:
+            boxes.append(box)
+    return boxes
+
+
+def refine_box(gray, box, scale_factor=1.1, min_neighbors=4):
+    """Re-detect one face in a full-resolution ROI around `box`; keeps `box` if not found."""
+    height, width = gray.shape[:2]
+    x, y, w, h = box
+    mx, my = int(w * REFINE_MARGIN), int(h * REFINE_MARGIN)
+    x0, y0 = max(0, x - mx), max(0, y - my)
+    x1, y1 = min(width, x + w + mx), min(height, y + h + my)
+
+    found = face_cascade.get().detectMultiScale(
+        gray[y0:y1, x0:x1],
+        scaleFactor=scale_factor,
+        minNeighbors=min_neighbors,
+        minSize=(int(w * 0.7), int(h * 0.7)),
+        maxSize=(int(w * 1.4), int(h * 1.4))
+    )
+    if len(found) == 0:
+        return box
+    # เลือกกล่องที่ใหญ่สุดใน ROI
+    fx, fy, fw, fh = max(found, key=lambda b: b[2] * b[3])
+    return (int(x0 + fx), int(y0 + fy), int(fw), int(fh))
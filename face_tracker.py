@@ -0,0 +1,160 @@
+import os
+
+import cv2
+
+# --- Settings ---
+FACE_DETECT_EVERY = int(os.environ.get("FACE_DETECT_EVERY", 5))        # ตรวจเต็มเฟรมทุก N เฟรมของวิดีโอ
+FACE_MAX_PER_TRACK = int(os.environ.get("FACE_MAX_PER_TRACK", 4))      # ส่งเข้าโมเดลสูงสุดต่อหนึ่งหน้า
+DHASH_DISTANCE = int(os.environ.get("FACE_DHASH_DISTANCE", 6))         # bit ที่ต่างกันได้ (จาก 64) ถือว่าซ้ำ
+TRACK_MATCH_THRESHOLD = 0.6
+TRACK_SEARCH_MARGIN = 0.5
+
+
+def dhash(gray, size=8):
+    """64-bit difference hash of a grayscale crop."""
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / (aw * ah + bw * bh - inter)
+
+
+class FaceTracker:
+    """
+    Follows faces across frames so the Haar detector does not run on every
+    frame and the classifier does not see the same face over and over.
+
+    `detect(gray)` (full detection) runs once `detect_every` video frames
+    have passed since the last detection; in between each face is followed
+    with template matching in a window around its last box. Frames sampled
+    further apart than that are always detected. A lost face forces
+    detection on the next frame.
+    `faces_to_score` only returns crops that differ (by dHash) from the
+    ones already scored for that track, at most `max_per_track` per track.
+    """
+
+    def __init__(self, detect, detect_every=FACE_DETECT_EVERY, max_per_track=FACE_MAX_PER_TRACK,
+                 hash_distance=DHASH_DISTANCE, match_threshold=TRACK_MATCH_THRESHOLD,
+                 search_margin=TRACK_SEARCH_MARGIN):
+        self.detect = detect
+        self.detect_every = max(1, detect_every)
+        self.max_per_track = max_per_track
+        self.hash_distance = hash_distance
+        self.match_threshold = match_threshold
+        self.search_margin = search_margin
+
+        self.tracks = {}   # id -> {"box", "template", "hashes"}
+        self.next_id = 0
+        self.last_detect = None
+        self.frame_no = -1
+        self.stats = {"frames": 0, "detections": 0, "tracked": 0, "duplicates": 0, "scored": 0}
+
+    # ---------- tracking ----------
+
+    def update(self, gray, index=None):
+        """
+        Returns [(track_id, box)] for every face in this frame. `index` is
+        the frame's position in the video (default: consecutive frames).
+        """
+        self.frame_no = self.frame_no + 1 if index is None else index
+        self.stats["frames"] += 1
+        if self.last_detect is None or self.frame_no - self.last_detect >= self.detect_every:
+            self._detect(gray)
+            self.last_detect = self.frame_no
+        elif not self._track(gray):
+            self.last_detect = None  # หลุด: ตรวจเต็มเฟรมรอบหน้า
+
+        return [(track_id, t["box"]) for track_id, t in self.tracks.items()]
+
+    def _detect(self, gray):
+        self.stats["detections"] += 1
+        boxes = [tuple(int(v) for v in box) for box in self.detect(gray)]
+
+        # จับคู่กับ track เดิมด้วย IoU (greedy) ที่เหลือเป็นหน้าใหม่
+        tracks = {}
+        unmatched = dict(self.tracks)
+        for box in boxes:
+            best, best_iou = None, 0.3
+            for track_id, t in unmatched.items():
+                overlap = iou(box, t["box"])
+                if overlap > best_iou:
+                    best, best_iou = track_id, overlap
+            if best is None:
+                best = self.next_id
+                self.next_id += 1
+                track = {"hashes": []}
+            else:
+                track = unmatched.pop(best)
+            track["box"] = box
+            track["template"] = self._crop(gray, box)
+            tracks[best] = track
+        self.tracks = tracks
+
+    def _track(self, gray):
+        height, width = gray.shape[:2]
+        ok = True
+        for track_id, t in list(self.tracks.items()):
+            x, y, w, h = t["box"]
+            mx, my = int(w * self.search_margin), int(h * self.search_margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(width, x + w + mx), min(height, y + h + my)
+            window = gray[y0:y1, x0:x1]
+            if window.shape[0] < h or window.shape[1] < w:
+                del self.tracks[track_id]
+                ok = False
+                continue
+
+            result = cv2.matchTemplate(window, t["template"], cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(result)
+            if score < self.match_threshold:
+                del self.tracks[track_id]
+                ok = False
+                continue
+
+            t["box"] = (x0 + dx, y0 + dy, w, h)
+            t["template"] = self._crop(gray, t["box"])
+            self.stats["tracked"] += 1
+        return ok
+
+    @staticmethod
+    def _crop(gray, box):
+        x, y, w, h = box
+        return gray[y:y + h, x:x + w].copy()
+
+    # ---------- dedup ----------
+
+    def faces_to_score(self, gray, index=None):
+        """
+        Update the tracks with this frame and return [(track_id, box)] of
+        the faces worth sending to the classifier.
+        """
+        selected = []
+        for track_id, box in self.update(gray, index):
+            track = self.tracks[track_id]
+            if len(track["hashes"]) >= self.max_per_track:
+                self.stats["duplicates"] += 1
+                continue
+            h = dhash(track["template"])
+            if any(hamming(h, seen) <= self.hash_distance for seen in track["hashes"]):
+                self.stats["duplicates"] += 1
+                continue
+            track["hashes"].append(h)
+            self.stats["scored"] += 1
+            selected.append((track_id, box))
+        return selected
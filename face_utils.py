@@ -1,19 +1,16 @@
 import cv2
 
-# โหลดโมเดลตรวจจับหน้า (มากับ OpenCV)
-face_cascade = cv2.CascadeClassifier(
-    cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-)
+from face_detector import detect_faces
+from face_tracker import FaceTracker
+
+def detect_face_boxes(gray):
+    # cascade ตัวเดียวกับ analyzer, ตรวจบนเฟรมที่ย่อแล้ว (FACE_DETECT_WIDTH)
+    return detect_faces(gray, min_neighbors=5)
 
 def extract_faces(frame):
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
-    faces_rect = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.1,
-        minNeighbors=5,
-        minSize=(60, 60)
-    )
+    faces_rect = detect_face_boxes(gray)
 
     faces = []
     for (x, y, w, h) in faces_rect:
@@ -21,3 +18,15 @@ def extract_faces(frame):
         faces.append(face)
 
     return faces
+
+def track_faces(frames, tracker=None):
+    """
+    Yield the face crops worth scoring from consecutive frames: faces are
+    tracked between periodic detections and near-duplicate crops of the
+    same face are skipped (see FaceTracker).
+    """
+    tracker = tracker or FaceTracker(detect_face_boxes)
+    for frame in frames:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        for _, (x, y, w, h) in tracker.faces_to_score(gray):
+            yield frame[y:y+h, x:x+w]
@@ -0,0 +1,183 @@
+import bisect
+import struct
+
+import cv2
+
+from video_utils import iter_frames
+
+# codec ที่ทุกเฟรมเป็น keyframe: seek ได้ถูก ไม่ต้อง decode ย้อนกลับ
+INTRA_ONLY_CODECS = {"MJPG", "JPEG", "PNG", "AVRN", "AP4H", "APCN", "APCH", "APCS", "FFV1", "HFYU", "DIB"}
+
+# ความยาว GOP เมื่ออ่านจากไฟล์ไม่ได้ (ไม่ใช่ MP4 / MOV) ค่าทั่วไปของ H.264 / H.265
+DEFAULT_GOP = 250
+
+def codec_of(cap):
+    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    return "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip().upper()
+
+
+def _boxes(data, start=0, end=None):
+    """Yield (type, payload_start, payload_end) of the MP4 boxes in data[start:end]."""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", data[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _read_moov(f):
+    """The payload of the top-level moov box, read without loading mdat."""
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            return None
+        size, kind = struct.unpack(">I4s", head)
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header = 16
+        if kind == b"moov":
+            return f.read(size - header) if size else f.read()
+        if size < header:
+            return None
+        f.seek(size - header, 1)
+
+
+def mp4_keyframes(video_path):
+    """
+    0-based indices of the keyframes of the first video track, read from
+    the MP4 / MOV sync sample table (stss). Returns None when they cannot
+    be read (other containers, fragmented MP4) and [] when the track has
+    no stss, i.e. every frame is a keyframe.
+    """
+    try:
+        with open(video_path, "rb") as f:
+            moov = _read_moov(f)
+    except OSError:
+        return None
+    if moov is None:
+        return None
+
+    def find(kind, start, end):
+        for box, s, e in _boxes(moov, start, end):
+            if box == kind:
+                return s, e
+        return None
+
+    for box, start, end in _boxes(moov):
+        if box != b"trak":
+            continue
+        mdia = find(b"mdia", start, end)
+        hdlr = mdia and find(b"hdlr", *mdia)
+        # hdlr: version/flags (4) + pre_defined (4) + handler_type (4)
+        if not hdlr or moov[hdlr[0] + 8:hdlr[0] + 12] != b"vide":
+            continue
+        minf = find(b"minf", *mdia)
+        stbl = minf and find(b"stbl", *minf)
+        stsz = stbl and find(b"stsz", *stbl)
+        # fragmented MP4: ตัวอย่างอยู่ใน moof ไม่ใช่ stbl (sample_count = 0)
+        if not stsz or struct.unpack(">I", moov[stsz[0] + 8:stsz[0] + 12])[0] == 0:
+            return None
+        stss = find(b"stss", *stbl)
+        if not stss:
+            return []
+        count = struct.unpack(">I", moov[stss[0] + 4:stss[0] + 8])[0]
+        numbers = struct.unpack(f">{count}I", moov[stss[0] + 8:stss[0] + 8 + 4 * count])
+        return [n - 1 for n in numbers]
+    return None
+
+
+def gop_of(keyframes, total):
+    """Average distance between keyframes (DEFAULT_GOP when unknown)."""
+    if keyframes is None:
+        return DEFAULT_GOP
+    if not keyframes:
+        return 1
+    if len(keyframes) == 1:
+        return max(1, total)
+    return max(1, round((keyframes[-1] - keyframes[0]) / (len(keyframes) - 1)))
+
+
+def choose_strategy(codec, step, gop=DEFAULT_GOP):
+    # ห่างกันเกินหนึ่ง GOP: seek ไป keyframe ถูกกว่า decode ทุกเฟรมระหว่างทาง
+    if codec in INTRA_ONLY_CODECS:
+        return "seek"
+    if step >= gop:
+        return "seek"
+    return "grab"
+
+
+def sample_frames(video_path, num_frames=15, per_second=None, min_step=5, max_frames=None, strategy="auto"):
+    """
+    Yield (frame_index, frame) for evenly spaced frames of a video.
+
+    By default about `num_frames` frames are spread over the whole video
+    (at least `min_step` frames apart). With `per_second`, that many frames
+    are taken per second of video instead. Only one decoded frame is held at
+    a time.
+
+    strategy: "grab" decodes sequentially and skips with grab() (see
+    video_utils.iter_frames), "seek" jumps to the keyframe nearest each
+    wanted frame, "auto" picks from the codec and the GOP read from the
+    file's keyframe table.
+    """
+    cap = cv2.VideoCapture(video_path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    codec = codec_of(cap)
+    cap.release()
+
+    if per_second:
+        step = max(1, round(fps / per_second))
+    else:
+        step = max(min_step, total // num_frames)
+
+    keyframes = None
+    if codec not in INTRA_ONLY_CODECS:
+        keyframes = mp4_keyframes(video_path)
+    if strategy == "auto":
+        strategy = choose_strategy(codec, step, gop_of(keyframes, total))
+
+    if strategy == "seek" and total > 0:
+        yield from _seek_frames(video_path, total, step, max_frames, keyframes or None)
+    else:
+        for n, frame in enumerate(iter_frames(video_path, max_frames, step)):
+            yield n * step, frame
+
+
+def _seek_frames(video_path, total, step, max_frames, keyframes=None):
+    """
+    Seek to every step-th frame. With `keyframes`, each target is moved to
+    the nearest keyframe so the decoder never decodes forward from one.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        count = 0
+        last = None
+        for i in range(0, total, step):
+            if max_frames is not None and count >= max_frames:
+                return
+            if keyframes:
+                k = bisect.bisect_left(keyframes, i)
+                near = [keyframes[j] for j in (k - 1, k) if 0 <= j < len(keyframes)]
+                i = min(near, key=lambda x: abs(x - i))
+                if i == last:
+                    continue
+            last = i
+            cap.set(cv2.CAP_PROP_POS_FRAMES, i)
+            ret, frame = cap.read()
+            if not ret:
+                return
+            count += 1
+            yield i, frame
+    finally:
+        cap.release()
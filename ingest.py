@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from werkzeug.utils import secure_filename
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+
+def video_extension(filename):
+    ext = os.path.splitext(secure_filename(filename or ""))[1].lower()
+    return ext or ".mp4"
+
+
+def content_path(upload_dir, video_hash):
+    # เก็บตาม hash อย่างเดียว ไฟล์เดียวกันที่ส่งมาคนละนามสกุลจึงไม่ถูกเขียนซ้ำ
+    return os.path.join(upload_dir, video_hash)
+
+
+def meta_path(upload_dir, video_hash):
+    return os.path.join(upload_dir, video_hash + ".json")
+
+
+def store_content(tmp_path, upload_dir, video_hash, ext):
+    """
+    Move a fully written `tmp_path` to uploads/<sha256>, or drop it when
+    that content is already stored. The extension of the first upload is
+    kept in uploads/<sha256>.json. Returns (path, duplicate).
+    """
+    path = content_path(upload_dir, video_hash)
+    if os.path.exists(path):
+        # ไฟล์เดียวกันเคยอัปโหลดแล้ว ไม่ต้องเขียนซ้ำ
+        os.remove(tmp_path)
+        return path, True
+
+    with open(meta_path(upload_dir, video_hash), "w") as f:
+        json.dump({"ext": ext, "stored_at": time.time()}, f)
+    os.replace(tmp_path, path)
+    return path, False
+
+
+def store_upload(stream, upload_dir, filename, chunk_size=CHUNK_SIZE):
+    """
+    Stream an upload to disk in chunks while hashing it, in a single pass.
+
+    The file is stored content-addressed as uploads/<sha256> (see
+    `store_content`); if that file already exists the new copy is
+    dropped. Returns (video_hash, path, duplicate).
+    """
+    ext = video_extension(filename)
+    sha = hashlib.sha256()
+
+    fd, tmp_path = tempfile.mkstemp(dir=upload_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    video_hash = sha.hexdigest()
+    path, duplicate = store_content(tmp_path, upload_dir, video_hash, ext)
+    return video_hash, path, duplicate
+
+
+UPLOAD_MAX_CHUNK = int(os.environ.get("UPLOAD_MAX_CHUNK", 64 * 1024 * 1024))
+UPLOAD_SESSION_TTL = float(os.environ.get("UPLOAD_SESSION_TTL", 24 * 3600))  # วินาทีที่ไม่มี chunk ใหม่
+UPLOAD_SWEEP_INTERVAL = 600  # วินาที
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, **info):
+        super().__init__(message)
+        self.status = status
+        self.info = info
+
+
+class ChunkedUploads:
+    """
+    Resumable uploads sent as a series of PUT chunks.
+
+    Each session appends to `sessions/<id>.part` and keeps a running
+    SHA-256, so completing an upload does not re-read the file. A chunk is
+    only accepted at the current offset and, when the client sends its
+    hash, only if the hash matches; otherwise it is cut off again. Session
+    state (offset, metadata) is saved to `sessions/<id>.json` after every
+    chunk; after a restart the hash is rebuilt from the part file.
+
+    Sessions that received nothing for `ttl` seconds are removed with
+    their files by `sweep()`, which runs at start-up and at most every
+    UPLOAD_SWEEP_INTERVAL seconds when a session is created.
+    """
+
+    def __init__(self, upload_dir, chunk_size=CHUNK_SIZE, max_chunk=UPLOAD_MAX_CHUNK,
+                 ttl=UPLOAD_SESSION_TTL):
+        self.upload_dir = upload_dir
+        self.dir = os.path.join(upload_dir, "sessions")
+        self.chunk_size = chunk_size
+        self.max_chunk = max_chunk
+        self.ttl = ttl
+        os.makedirs(self.dir, exist_ok=True)
+
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.last_sweep = 0
+        for name in os.listdir(self.dir):
+            if name.endswith(".json"):
+                self._restore(name[:-len(".json")])
+        self.sweep()
+
+    # ---------- files ----------
+
+    def _path(self, upload_id, suffix):
+        return os.path.join(self.dir, upload_id + suffix)
+
+    def _save(self, session):
+        meta = {k: v for k, v in session.items() if not k.startswith("_")}
+        path = self._path(session["id"], ".json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def _restore(self, upload_id):
+        with open(self._path(upload_id, ".json"), "r") as f:
+            session = json.load(f)
+        part = self._path(upload_id, ".part")
+        # ตัดส่วนของ chunk ที่เขียนค้างตอน crash (ยังไม่ได้ตรวจ) ทิ้ง
+        with open(part, "a+b") as f:
+            f.truncate(session["offset"])
+        sha = hashlib.sha256()
+        with open(part, "rb") as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                sha.update(chunk)
+        session["_sha"] = sha
+        session["_lock"] = threading.Lock()
+        self.sessions[upload_id] = session
+
+    # ---------- sessions ----------
+
+    def create(self, filename, size=None, **meta):
+        session = {
+            "id": uuid.uuid4().hex,
+            "filename": filename,
+            "ext": video_extension(filename),
+            "size": size,
+            "offset": 0,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+            **meta,
+        }
+        open(self._path(session["id"], ".part"), "wb").close()
+        self._save(session)
+        session["_sha"] = hashlib.sha256()
+        session["_lock"] = threading.Lock()
+        with self.lock:
+            self.sessions[session["id"]] = session
+        if time.time() - self.last_sweep >= UPLOAD_SWEEP_INTERVAL:
+            self.sweep()
+        return self.public(session)
+
+    def sweep(self, now=None):
+        """
+        Remove sessions idle for longer than `ttl`, and leftover files in
+        sessions/ (e.g. prefix snapshots) that belong to no session.
+        Returns the ids of the removed sessions.
+        """
+        now = time.time() if now is None else now
+        self.last_sweep = now
+        expired = []
+        with self.lock:
+            for upload_id, session in list(self.sessions.items()):
+                if now - session.get("updated_at", session["created_at"]) <= self.ttl:
+                    continue
+                # กำลังรับ chunk อยู่ ไม่ถือว่าหมดอายุ
+                if not session["_lock"].acquire(blocking=False):
+                    continue
+                try:
+                    del self.sessions[upload_id]
+                    expired.append(upload_id)
+                finally:
+                    session["_lock"].release()
+            live = set(self.sessions)
+
+        for name in os.listdir(self.dir):
+            path = os.path.join(self.dir, name)
+            if name.split(".")[0] in live:
+                continue
+            try:
+                if name.split(".")[0] in expired or now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        return expired
+
+    def _get(self, upload_id):
+        session = self.sessions.get(upload_id)
+        if session is None:
+            raise UploadError("Upload not found", 404)
+        return session
+
+    def get(self, upload_id):
+        return self.public(self._get(upload_id))
+
+    def update(self, upload_id, **meta):
+        session = self._get(upload_id)
+        with session["_lock"]:
+            session.update(meta)
+            self._save(session)
+
+    @staticmethod
+    def public(session):
+        return {k: v for k, v in session.items() if not k.startswith("_")}
+
+    def write_chunk(self, upload_id, offset, stream, chunk_sha256=None):
+        """
+        Append the bytes of `stream` at `offset`. Returns the session.
+        Raises UploadError (409 with the current offset when `offset` is
+        not where the upload stands, 400 on a hash mismatch).
+        """
+        session = self._get(upload_id)
+        with session["_lock"]:
+            if offset != session["offset"]:
+                raise UploadError("Offset mismatch", 409, offset=session["offset"])
+
+            # hash ของทั้งไฟล์ต่อจาก chunk ก่อนหน้า, ใช้จริงเมื่อ chunk ผ่านการตรวจ
+            file_sha = session["_sha"].copy()
+            chunk_sha = hashlib.sha256()
+            written = 0
+            part = self._path(upload_id, ".part")
+            with open(part, "r+b") as out:
+                out.seek(offset)
+                # ตัดส่วนที่ค้างจาก chunk ที่ขาดกลางทาง ไม่ให้เหลือขยะต่อท้าย chunk ที่สั้นกว่า
+                out.truncate(offset)
+                try:
+                    while True:
+                        data = stream.read(self.chunk_size)
+                        if not data:
+                            break
+                        written += len(data)
+                        if written > self.max_chunk:
+                            raise UploadError("Chunk too large", 413)
+                        file_sha.update(data)
+                        chunk_sha.update(data)
+                        out.write(data)
+
+                    if chunk_sha256 and chunk_sha.hexdigest() != chunk_sha256.lower():
+                        raise UploadError("Chunk hash mismatch", 400, offset=offset)
+                    if session["size"] is not None and offset + written > session["size"]:
+                        raise UploadError("Chunk goes past the declared size", 400, offset=offset)
+                    out.flush()
+                    os.fsync(out.fileno())
+                except BaseException:
+                    # connection หลุด / chunk ไม่ผ่าน: ไฟล์กลับไปยาวเท่า offset เดิม
+                    out.truncate(offset)
+                    raise
+
+            session["_sha"] = file_sha
+            session["offset"] = offset + written
+            session["updated_at"] = time.time()
+            self._save(session)
+            return self.public(session)
+
+    def snapshot_prefix(self, upload_id):
+        """Copy the bytes received so far to a separate file (for early analysis)."""
+        session = self._get(upload_id)
+        with session["_lock"]:
+            path = self._path(upload_id, ".prefix" + session["ext"])
+            with open(self._path(upload_id, ".part"), "rb") as src, open(path, "wb") as dst:
+                remaining = session["offset"]
+                while remaining > 0:
+                    data = src.read(min(self.chunk_size, remaining))
+                    if not data:
+                        break
+                    dst.write(data)
+                    remaining -= len(data)
+            return path, session["offset"]
+
+    def complete(self, upload_id, sha256=None):
+        """
+        Move a finished upload to its content-addressed path. Returns
+        (video_hash, path, duplicate, session) like `store_upload`.
+        """
+        session = self._get(upload_id)
+        with session["_lock"]:
+            if session["size"] is not None and session["offset"] != session["size"]:
+                raise UploadError("Upload is incomplete", 409, offset=session["offset"])
+            video_hash = session["_sha"].hexdigest()
+            if sha256 and sha256.lower() != video_hash:
+                raise UploadError("File hash mismatch", 400, sha256=video_hash)
+
+            part = self._path(upload_id, ".part")
+            # ไฟล์ต้องมีแค่ส่วนที่นับเข้า hash แล้ว (กันขยะจาก process ที่ตายกลาง chunk)
+            with open(part, "r+b") as f:
+                f.truncate(session["offset"])
+            path, duplicate = store_content(part, self.upload_dir, video_hash, session["ext"])
+            os.remove(self._path(upload_id, ".json"))
+            with self.lock:
+                self.sessions.pop(upload_id, None)
+            return video_hash, path, duplicate, self.public(session)
@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+ANALYSIS_QUEUE_DEPTH = int(os.environ.get("ANALYSIS_QUEUE_DEPTH", 32))
+
+
+class QueueError(Exception):
+    pass
+
+
+class QueueFull(QueueError):
+    pass
+
+
+def _ready():
+    return os.getpid()
+
+
+class JobQueue:
+    """
+    Runs `fn(*args)` jobs on a pool of worker processes.
+
+    Jobs with the same key that are still queued or running are coalesced:
+    the second submit returns the existing job and only adds its callback.
+    At most `max_queue` jobs may be unfinished at once; finished jobs are
+    kept for lookup up to `keep_finished`.
+    """
+
+    def __init__(self, fn, workers=ANALYSIS_WORKERS, max_queue=ANALYSIS_QUEUE_DEPTH,
+                 initializer=None, keep_finished=1000):
+        self.fn = fn
+        self.workers = workers
+        self.max_queue = max_queue
+        self.initializer = initializer
+        self.keep_finished = keep_finished
+
+        self.jobs = OrderedDict()
+        self.active = {}  # key -> job id
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def _get_pool(self):
+        if self.pool is None:
+            # spawn: worker โหลดโมเดลของตัวเอง ไม่ fork thread / model จาก Flask
+            # worker จะรันสคริปต์ __main__ ซ้ำ (__mp_main__) สคริปต์ต้องไม่เปิดไฟล์ข้อมูลตอน import
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer,
+            )
+        return self.pool
+
+    def submit(self, key, *args, callback=None):
+        with self.lock:
+            job_id = self.active.get(key)
+            if job_id is not None:
+                job = self.jobs[job_id]
+                if callback is not None:
+                    job["callbacks"].append(callback)
+                return self._public(job)
+
+            if len(self.active) >= self.max_queue:
+                raise QueueFull("Analysis queue is full")
+
+            job = {
+                "id": uuid.uuid4().hex,
+                "key": key,
+                "status": "queued",
+                "created_at": time.time(),
+                "finished_at": None,
+                "result": None,
+                "error": None,
+                "callbacks": [callback] if callback is not None else [],
+                "future": None,
+            }
+            # ลงทะเบียน job หลัง submit สำเร็จ: submit ล้มจะไม่มี job ค้างสถานะ queued
+            job["future"] = self._submit(*args)
+            self.jobs[job["id"]] = job
+            self.active[key] = job["id"]
+
+        job["future"].add_done_callback(lambda f, job=job: self._finish(job, f))
+        return self._public(job)
+
+    def _submit(self, *args):
+        # worker ตาย (OOM / crash ใน OpenCV, torch / initializer ล้ม) ทำให้ pool ใช้ต่อไม่ได้
+        # ทิ้ง pool เดิม สร้างใหม่แล้วลองอีกครั้งเดียว
+        try:
+            return self._get_pool().submit(self.fn, *args)
+        except BrokenProcessPool:
+            self._reset_pool()
+        try:
+            return self._get_pool().submit(self.fn, *args)
+        except BrokenProcessPool as e:
+            self._reset_pool()
+            raise QueueError("Analysis workers are unavailable") from e
+
+    def _reset_pool(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def _finish(self, job, future):
+        with self.lock:
+            try:
+                job["result"] = future.result()
+                job["status"] = "done"
+            except Exception as e:
+                job["error"] = str(e)
+                job["status"] = "failed"
+            job["finished_at"] = time.time()
+            self.active.pop(job["key"], None)
+            callbacks = job["callbacks"]
+            job["callbacks"] = []
+            self._trim()
+
+        for callback in callbacks:
+            callback(job)
+
+    def _trim(self):
+        finished = len(self.jobs) - len(self.active)
+        for job_id in list(self.jobs):
+            if finished <= self.keep_finished:
+                break
+            if self.jobs[job_id]["finished_at"] is not None:
+                del self.jobs[job_id]
+                finished -= 1
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return None if job is None else self._public(job)
+
+    def _public(self, job):
+        status = job["status"]
+        if status == "queued" and job["future"] is not None and job["future"].running():
+            status = "running"
+        return {
+            "id": job["id"],
+            "key": job["key"],
+            "status": status,
+            "created_at": job["created_at"],
+            "finished_at": job["finished_at"],
+            "result": job["result"],
+            "error": job["error"],
+        }
+
+    def warm_up(self, timeout=None):
+        """
+        Start every worker process now (running `initializer` in each) so
+        the first upload does not pay for process start and model loading.
+        """
+        pool = self._get_pool()
+        try:
+            futures = [pool.submit(_ready) for _ in range(self.workers)]
+            return sorted({f.result(timeout=timeout) for f in futures})
+        except BrokenProcessPool:
+            with self.lock:
+                if self.pool is pool:
+                    self._reset_pool()
+            raise
+
+    def stats(self):
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.max_queue,
+                "active": len(self.active),
+            }
+
+    def shutdown(self):
+        self._reset_pool()
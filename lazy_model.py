@@ -0,0 +1,32 @@
+import threading
+
+
+class LazyModel:
+    """
+    Thread-safe handle that builds a model on first use.
+
+    `loader` is called at most once, the first time `get()` (or the handle
+    itself) is called. Later calls return the same object without locking.
+    """
+
+    def __init__(self, loader, name=None):
+        self.loader = loader
+        self.name = name or getattr(loader, "__name__", "model")
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self.loader()
+                    self._loaded = True
+        return self._value
+
+    def __call__(self, *args, **kwargs):
+        return self.get()(*args, **kwargs)
@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+FIELDS = ("reputation", "reward", "balance", "last_win")
+DEFAULTS = {"reputation": 0, "reward": 0, "balance": 100, "last_win": 0}
+
+
+class LedgerTxn:
+    """
+    Dict-like view of the accounts used inside `Ledger.transaction()`.
+
+    Accounts are copied from the ledger cache the first time they are
+    touched, so changes stay private until the transaction commits.
+    """
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.local = {}
+
+    def __contains__(self, user_id):
+        return user_id in self.local or user_id in self.ledger.accounts
+
+    def __getitem__(self, user_id):
+        if user_id not in self.local:
+            self.local[user_id] = dict(self.ledger.accounts[user_id])
+        return self.local[user_id]
+
+    def __setitem__(self, user_id, account):
+        self.local[user_id] = account
+
+    def get(self, user_id, default=None):
+        return self[user_id] if user_id in self else default
+
+    def changes(self):
+        return {
+            user_id: account
+            for user_id, account in self.local.items()
+            if self.ledger.accounts.get(user_id) != account
+        }
+
+
+class Ledger:
+    """
+    User accounts (reputation, reward, balance, last_win) stored in SQLite
+    (WAL mode) with an in-memory cache of every account.
+
+    All updates go through `transaction()`, which serialises writers and
+    commits every touched account in one SQLite transaction, so multi-
+    account transfers (fee -> winner, rewards) are atomic and no update is
+    lost to a read-modify-write race.
+    """
+
+    def __init__(self, db_path="ledger.db", import_file="users.json"):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS accounts ("
+            " user_id TEXT PRIMARY KEY,"
+            " reputation INTEGER NOT NULL DEFAULT 0,"
+            " reward INTEGER NOT NULL DEFAULT 0,"
+            " balance INTEGER NOT NULL DEFAULT 100,"
+            " last_win REAL NOT NULL DEFAULT 0)"
+        )
+        self.conn.commit()
+
+        self.accounts = {}
+        self.listeners = []
+        for row in self.conn.execute("SELECT user_id, reputation, reward, balance, last_win FROM accounts"):
+            self.accounts[row[0]] = dict(zip(FIELDS, row[1:]))
+
+        if not self.accounts and import_file and os.path.exists(import_file):
+            # ครั้งแรก: ย้ายข้อมูลจาก users.json เดิม
+            self.import_json(import_file)
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            txn = LedgerTxn(self)
+            yield txn
+            self._commit(txn.changes())
+
+    def _commit(self, changes):
+        if not changes:
+            return
+        rows = [
+            (user_id, *(account.get(f, DEFAULTS[f]) for f in FIELDS))
+            for user_id, account in changes.items()
+        ]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO accounts (user_id, reputation, reward, balance, last_win)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(user_id) DO UPDATE SET"
+                " reputation=excluded.reputation, reward=excluded.reward,"
+                " balance=excluded.balance, last_win=excluded.last_win",
+                rows,
+            )
+        for user_id, account in changes.items():
+            self.accounts[user_id] = dict(account)
+        for listener in self.listeners:
+            listener(changes)
+
+    def on_commit(self, listener):
+        """Call `listener(changes)` with the changed accounts after each commit."""
+        self.listeners.append(listener)
+
+    def get(self, user_id):
+        with self.lock:
+            account = self.accounts.get(user_id)
+            return None if account is None else dict(account)
+
+    def snapshot(self):
+        with self.lock:
+            return {user_id: dict(a) for user_id, a in self.accounts.items()}
+
+    def import_json(self, filename):
+        with open(filename, "r") as f:
+            users = json.load(f)
+        with self.lock:
+            self._commit({
+                user_id: {f: account.get(f, DEFAULTS[f]) for f in FIELDS}
+                for user_id, account in users.items()
+            })
+
+    def export_json(self, filename):
+        tmp = filename + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, filename)
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+VOTING_WINDOW = 120  # วินาที
+MEMPOOL_MAX_SIZE = int(os.environ.get("MEMPOOL_MAX_SIZE", 100))
+
+
+class MempoolFull(Exception):
+    pass
+
+
+class VoteError(Exception):
+    pass
+
+
+class Mempool:
+    """
+    Pending verifications waiting for validator votes, keyed by item id
+    (the video hash). Each item has its own vote set and voting deadline.
+    """
+
+    def __init__(self, max_size=MEMPOOL_MAX_SIZE, window=VOTING_WINDOW):
+        self.max_size = max_size
+        self.window = window
+        self.items = OrderedDict()
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item_id, data, uploader_pool):
+        """Returns (item, created). An id that is already pending is not replaced."""
+        with self.lock:
+            if item_id in self.items:
+                return self.items[item_id], False
+            if len(self.items) >= self.max_size:
+                raise MempoolFull("Too many pending verifications")
+
+            created_at = data.get("created_at", time.time())
+            item = {
+                "id": item_id,
+                "data": data,
+                "votes": [],
+                "uploader_pool": uploader_pool,
+                "deadline": created_at + self.window,
+            }
+            self.items[item_id] = item
+            return item, True
+
+    def get(self, item_id):
+        return self.items.get(item_id)
+
+    def remove(self, item_id):
+        with self.lock:
+            return self.items.pop(item_id, None)
+
+    def vote(self, item_id, node, vote):
+        with self.lock:
+            item = self.items.get(item_id)
+            if item is None:
+                raise VoteError("No pending block")
+            if item["deadline"] <= time.time():
+                raise VoteError("Voting window closed")
+            # กันโหวตซ้ำ
+            if any(v["node"] == node for v in item["votes"]):
+                raise VoteError("Node already voted")
+            item["votes"].append({"node": node, "vote": vote})
+            return item
+
+    def expired(self, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            return [item for item in self.items.values() if item["deadline"] <= now]
+
+    def all(self):
+        with self.lock:
+            return list(self.items.values())
+
+    def remaining_time(self, item, now=None):
+        now = time.time() if now is None else now
+        return max(0, int(item["deadline"] - now))
@@ -0,0 +1,62 @@
+import hashlib
+import json
+
+# prefix ต่างกันระหว่าง leaf กับ node กันการปลอม proof (second preimage)
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def leaf_hash(record):
+    encoded = json.dumps(record, sort_keys=True).encode()
+    return hashlib.sha256(LEAF_PREFIX + encoded).hexdigest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def _next_level(level):
+    # จำนวนคี่: node สุดท้ายถูกยกขึ้นไปชั้นบนตรง ๆ (ไม่ duplicate)
+    nxt = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        nxt.append(level[-1])
+    return nxt
+
+
+def merkle_root(records):
+    level = [leaf_hash(r) for r in records]
+    if not level:
+        return hashlib.sha256(b"").hexdigest()
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+
+def merkle_proof(records, position):
+    """
+    Sibling hashes from leaf `position` up to the root, as a list of
+    {"hash", "side"} where side says whether the sibling is on the left or
+    the right.
+    """
+    level = [leaf_hash(r) for r in records]
+    proof = []
+    while len(level) > 1:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append({
+                "hash": level[sibling],
+                "side": "left" if sibling < position else "right",
+            })
+        level = _next_level(level)
+        position //= 2
+    return proof
+
+
+def verify_proof(record, proof, root):
+    current = leaf_hash(record)
+    for step in proof:
+        if step["side"] == "left":
+            current = node_hash(step["hash"], current)
+        else:
+            current = node_hash(current, step["hash"])
+    return current == root
@@ -0,0 +1,164 @@
+import copy
+import hashlib
+import json
+import os
+import random
+
+import numpy as np
+import torch
+
+from model import DeepfakeDetector
+from video_utils import iter_frames
+
+# --- Settings ---
+# fp32 = โมเดลเดิม, torchscript = trace + freeze, int8 = static quantization (x86 / fbgemm)
+MODES = ("fp32", "torchscript", "int8")
+DETECTOR_MODE = os.environ.get("DETECTOR_MODE", "fp32")
+DETECTOR_WEIGHTS = os.environ.get("DETECTOR_WEIGHTS")  # state_dict ที่เทรนแล้ว (ถ้ามี)
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", "model_cache")
+CALIBRATION_VIDEO = os.environ.get("CALIBRATION_VIDEO", os.path.join("uploads", "test2.mp4"))
+INPUT_SIZE = 299
+SAMPLE_COUNT = 64
+CALIBRATION_SEED = 0
+HOLDOUT_SEED = 1          # ชุดตรวจ drift แยกจากชุด calibrate
+AI_THRESHOLD = 0.7  # เกณฑ์ AI-GENERATED ของ ai_detector
+
+
+def weights_path():
+    return DETECTOR_WEIGHTS or os.path.join(MODEL_CACHE_DIR, "deepfake_resnet_fp32.pt")
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def load_fp32():
+    net = DeepfakeDetector()
+    path = weights_path()
+    if os.path.exists(path):
+        net.load_state_dict(torch.load(path, map_location="cpu"))
+    else:
+        # ยังไม่มี weights ที่เทรนแล้ว: เก็บหัว fc ที่สุ่มได้ไว้ ทุก mode จะได้ใช้ชุดเดียวกัน
+        os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+        torch.save(net.state_dict(), path)
+    return net.eval()
+
+
+def sample_set(count=SAMPLE_COUNT, seed=CALIBRATION_SEED):
+    """
+    Fixed (seeded) batch of preprocessed face-sized crops from
+    CALIBRATION_VIDEO. int8 is calibrated on CALIBRATION_SEED and the
+    drift check runs on a separate HOLDOUT_SEED set. Falls back to seeded
+    noise when the video is missing.
+    """
+    from ai_detector import preprocess_faces
+
+    if not os.path.exists(CALIBRATION_VIDEO):
+        return torch.rand(count, 3, INPUT_SIZE, INPUT_SIZE, generator=torch.Generator().manual_seed(seed))
+
+    rng = random.Random(seed)
+    frames = list(iter_frames(CALIBRATION_VIDEO, max_frames=30))
+    crops = []
+    for _ in range(count):
+        frame = rng.choice(frames)
+        size = rng.randint(60, min(240, *frame.shape[:2]))
+        y = rng.randint(0, frame.shape[0] - size)
+        x = rng.randint(0, frame.shape[1] - size)
+        crops.append(frame[y:y + size, x:x + size])
+    out = np.empty((count, INPUT_SIZE, INPUT_SIZE, 3), np.float32)
+    return preprocess_faces(crops, out).contiguous()
+
+
+def build(mode, net, samples, batch_size=8):
+    """Return the TorchScript module for `mode` built from the fp32 `net`."""
+    example = samples[:1]
+    with torch.no_grad():
+        if mode == "torchscript":
+            traced = torch.jit.trace(copy.deepcopy(net).to(memory_format=torch.channels_last), example)
+            return torch.jit.freeze(traced)
+
+        if mode == "int8":
+            from torch.ao.quantization import get_default_qconfig_mapping
+            from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+            prepared = prepare_fx(copy.deepcopy(net), get_default_qconfig_mapping("x86"),
+                                  example_inputs=(example,))
+            # calibrate: วัดช่วงค่า activation จากชุดตัวอย่าง
+            for start in range(0, len(samples), batch_size):
+                prepared(samples[start:start + batch_size])
+            quantized = convert_fx(prepared)
+            return torch.jit.freeze(torch.jit.trace(quantized, example))
+
+    raise ValueError(f"Unknown detector mode: {mode}")
+
+
+def prepare(mode, module):
+    # optimize_for_inference ใส่ weight แบบ prepacked ที่ save ไม่ได้ จึงทำหลังโหลด
+    if mode == "torchscript":
+        return torch.jit.optimize_for_inference(module)
+    return module
+
+
+def predict(net, samples, batch_size=8):
+    with torch.inference_mode():
+        return torch.cat([
+            torch.sigmoid(net(samples[start:start + batch_size])).flatten()
+            for start in range(0, len(samples), batch_size)
+        ])
+
+
+def drift_check(reference, candidate, samples, threshold=AI_THRESHOLD):
+    """Score difference of `candidate` against the fp32 `reference` on `samples`."""
+    expected = predict(reference, samples)
+    got = predict(candidate, samples)
+    diff = (expected - got).abs()
+    return {
+        "samples": len(samples),
+        "max_abs": round(diff.max().item(), 6),
+        "mean_abs": round(diff.mean().item(), 6),
+        "verdict_agreement": ((expected > threshold) == (got > threshold)).float().mean().item(),
+    }
+
+
+def cache_path(mode):
+    key = file_digest(weights_path())
+    return os.path.join(MODEL_CACHE_DIR, f"deepfake_resnet_{mode}_{key}_torch{torch.__version__}.pt")
+
+
+def load_detector(mode=DETECTOR_MODE):
+    """
+    The detector for `mode`. Optimized modes are built once (with a drift
+    report on hold-out samples written next to the file) and then loaded
+    from MODEL_CACHE_DIR; the cache key includes the weights' hash and the
+    torch version.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown detector mode: {mode} (expected one of {', '.join(MODES)})")
+    if mode == "fp32":
+        # channels_last เร็วกว่าบน CPU (oneDNN) และตรงกับ layout ของ buffer
+        return load_fp32().to(memory_format=torch.channels_last)
+
+    if os.path.exists(weights_path()):
+        path = cache_path(mode)
+        if os.path.exists(path):
+            return prepare(mode, torch.jit.load(path))
+
+    net = load_fp32()
+    samples = sample_set()
+    built = build(mode, net, samples)
+    path = cache_path(mode)
+    tmp = path + ".tmp"
+    torch.jit.save(built, tmp)
+    os.replace(tmp, path)
+
+    optimized = prepare(mode, built)
+    # วัด drift บนชุดที่ไม่ได้ใช้ calibrate
+    holdout = sample_set(seed=HOLDOUT_SEED)
+    report = {"mode": mode, "holdout_seed": HOLDOUT_SEED, **drift_check(net, optimized, holdout)}
+    with open(path + ".json", "w") as f:
+        json.dump(report, f, indent=2)
+    return optimized
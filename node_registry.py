@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+
+NODE_TTL = float(os.environ.get("NODE_TTL", 120))  # วินาที ไม่ส่ง heartbeat เกินนี้ = offline
+
+
+class RegistryError(Exception):
+    pass
+
+
+class NodeRegistry:
+    """
+    Registered validator nodes, indexed by id ("name:ip"), name and IP so
+    the uniqueness checks and vote membership test are O(1).
+
+    Changes are appended to a JSON-lines journal instead of rewriting the
+    whole file; the journal is compacted once it is mostly heartbeats.
+    A node is live if it was seen (registered, heartbeat or vote) within
+    `ttl` seconds; quorum counts live nodes only.
+    """
+
+    def __init__(self, journal_file="nodes.jsonl", import_file="nodes.json", ttl=NODE_TTL):
+        self.journal_file = journal_file
+        self.ttl = ttl
+        # heartbeat ถี่ ๆ ไม่ต้องลง journal ทุกครั้ง
+        self.persist_every = ttl / 4
+        self.lock = threading.RLock()
+
+        self.nodes = {}
+        self.by_name = {}
+        self.by_ip = {}
+        self.persisted_seen = {}
+        self.journal_lines = 0
+
+        if os.path.exists(journal_file):
+            self._replay()
+        elif import_file and os.path.exists(import_file):
+            # ครั้งแรก: ย้ายรายชื่อจาก nodes.json เดิม
+            self.import_json(import_file)
+
+    # ---------- journal ----------
+
+    def _replay(self):
+        with open(self.journal_file, "r") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # เขียนไม่จบตอน crash
+                entry = json.loads(line)
+                self.journal_lines += 1
+                if entry["op"] == "add":
+                    self._index(entry["node"])
+                elif entry["op"] == "seen" and entry["id"] in self.nodes:
+                    self.nodes[entry["id"]]["last_seen"] = entry["at"]
+                elif entry["op"] == "update" and entry["id"] in self.nodes:
+                    self.nodes[entry["id"]].update(entry["fields"])
+        self.persisted_seen = {i: n["last_seen"] for i, n in self.nodes.items()}
+
+    def _append(self, *entries):
+        with open(self.journal_file, "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, sort_keys=True) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal_lines += len(entries)
+        if self.journal_lines > 4 * len(self.nodes) + 100:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the journal as one "add" entry per node."""
+        with self.lock:
+            tmp = self.journal_file + ".tmp"
+            with open(tmp, "w") as f:
+                for node in self.nodes.values():
+                    f.write(json.dumps({"op": "add", "node": node}, sort_keys=True) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.journal_file)
+            self.journal_lines = len(self.nodes)
+            self.persisted_seen = {i: n["last_seen"] for i, n in self.nodes.items()}
+
+    def import_json(self, filename):
+        with open(filename, "r") as f:
+            ids = json.load(f).get("nodes", [])
+        now = time.time()
+        with self.lock:
+            entries = []
+            for node_id in ids:
+                name, _, ip = node_id.partition(":")
+                if node_id in self.nodes or name in self.by_name or ip in self.by_ip:
+                    continue
+                node = self._new_node(name, ip, now)
+                self._index(node)
+                entries.append({"op": "add", "node": node})
+            if entries:
+                self._append(*entries)
+            self.persisted_seen.update({e["node"]["id"]: now for e in entries})
+
+    # ---------- nodes ----------
+
+    @staticmethod
+    def _new_node(name, ip, now, stake=0, url=None):
+        return {
+            "id": f"{name}:{ip}",
+            "name": name,
+            "ip": ip,
+            "registered_at": now,
+            "last_seen": now,
+            "stake": stake,
+            "url": url,
+        }
+
+    def _index(self, node):
+        self.nodes[node["id"]] = node
+        self.by_name[node["name"]] = node["id"]
+        self.by_ip[node["ip"]] = node["id"]
+
+    def __contains__(self, node_id):
+        return node_id in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, node_id):
+        with self.lock:
+            node = self.nodes.get(node_id)
+            return None if node is None else dict(node)
+
+    def register(self, name, ip, stake=0, url=None):
+        """
+        Returns (node, created). Raises RegistryError when the name or the
+        IP already belongs to another node.
+        """
+        node_id = f"{name}:{ip}"
+        with self.lock:
+            if node_id in self.nodes:
+                self.touch(node_id)
+                return dict(self.nodes[node_id]), False
+            if name in self.by_name:
+                raise RegistryError("Node name already exists")
+            if ip in self.by_ip:
+                raise RegistryError("This IP already registered a node")
+
+            node = self._new_node(name, ip, time.time(), stake, url)
+            self._index(node)
+            self._append({"op": "add", "node": node})
+            self.persisted_seen[node_id] = node["last_seen"]
+            return dict(node), True
+
+    def update(self, node_id, **fields):
+        with self.lock:
+            if node_id not in self.nodes:
+                raise RegistryError("Unknown node")
+            self.nodes[node_id].update(fields)
+            self._append({"op": "update", "id": node_id, "fields": fields})
+
+    def touch(self, node_id, now=None):
+        """Mark a node as seen now (heartbeat / vote). Returns False if unknown."""
+        now = time.time() if now is None else now
+        with self.lock:
+            node = self.nodes.get(node_id)
+            if node is None:
+                return False
+            node["last_seen"] = now
+            if now - self.persisted_seen.get(node_id, 0) >= self.persist_every:
+                self.persisted_seen[node_id] = now
+                self._append({"op": "seen", "id": node_id, "at": now})
+            return True
+
+    # ---------- liveness ----------
+
+    def is_live(self, node, now=None):
+        now = time.time() if now is None else now
+        return now - node["last_seen"] <= self.ttl
+
+    def live_ids(self, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            return [i for i, n in self.nodes.items() if self.is_live(n, now)]
+
+    def quorum(self, now=None):
+        """Votes needed: a majority of the live nodes."""
+        return len(self.live_ids(now)) // 2 + 1
+
+    def public(self, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            return [{**n, "live": self.is_live(n, now)} for n in self.nodes.values()]
@@ -0,0 +1,67 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class DeadlineScheduler:
+    """
+    Runs callbacks at wall-clock deadlines from a single background thread.
+
+    Deadlines live in a heap, so the thread sleeps until exactly the next
+    one instead of being woken by polling. Scheduling a key again replaces
+    its previous deadline; `cancel(key)` drops it.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.entries = {}  # key -> seq ของรายการที่ยังใช้งานอยู่
+        self.counter = itertools.count()
+        self.cond = threading.Condition()
+        self.thread = None
+
+    def start(self):
+        with self.cond:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def schedule(self, key, when, fn):
+        self.start()
+        with self.cond:
+            seq = next(self.counter)
+            self.entries[key] = seq
+            heapq.heappush(self.heap, (when, seq, key, fn))
+            self.cond.notify()
+
+    def cancel(self, key):
+        with self.cond:
+            # ลบแบบ lazy: รายการใน heap จะถูกข้ามตอนถึงเวลา
+            self.entries.pop(key, None)
+
+    def pending(self):
+        with self.cond:
+            return len(self.entries)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while True:
+                    # ทิ้งรายการที่ถูก cancel / ถูกแทนที่แล้ว
+                    while self.heap and self.entries.get(self.heap[0][2]) != self.heap[0][1]:
+                        heapq.heappop(self.heap)
+                    if not self.heap:
+                        self.cond.wait()
+                        continue
+                    delay = self.heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    self.cond.wait(delay)
+
+                _, _, key, fn = heapq.heappop(self.heap)
+                del self.entries[key]
+
+            try:
+                fn()
+            except Exception as e:
+                print(f"[scheduler] {key} failed: {e}")
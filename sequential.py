@@ -0,0 +1,89 @@
+import math
+import os
+
+# --- Settings ---
+EARLY_EXIT = os.environ.get("ANALYSIS_EARLY_EXIT", "1") == "1"
+SEQ_MIN_SAMPLES = int(os.environ.get("SEQ_MIN_SAMPLES", 3))
+SEQ_MAX_SAMPLES = int(os.environ.get("SEQ_MAX_SAMPLES", 0))     # 0 = ไม่จำกัด
+SEQ_CONFIDENCE_Z = float(os.environ.get("SEQ_CONFIDENCE_Z", 2.576))  # ~99% สองด้าน
+# คะแนนชุดแรกมักใกล้กันมาก (variance ~0) กำหนดค่าต่ำสุดไว้ไม่ให้หยุดเร็วเกินไป
+MIN_VARIANCE = 0.01
+
+
+class SequentialTest:
+    """
+    Decides on-line whether the mean of a stream of scores in [0, 1] is
+    above or below `threshold`.
+
+    After each score the running mean's confidence interval
+    (mean +- z * sd / sqrt(n), with sd floored at sqrt(MIN_VARIANCE)) is
+    compared with the threshold; once it lies wholly on one side and at
+    least `min_samples` scores were seen, the test is decided. It also
+    stops at `max_samples` (0 = no limit) without a clear decision.
+    """
+
+    def __init__(self, threshold, min_samples=SEQ_MIN_SAMPLES, max_samples=SEQ_MAX_SAMPLES,
+                 z=SEQ_CONFIDENCE_Z):
+        self.threshold = threshold
+        self.min_samples = max(1, min_samples)
+        self.max_samples = max_samples
+        self.z = z
+        # Welford: mean / variance แบบ streaming
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, score):
+        self.n += 1
+        delta = score - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (score - self.mean)
+
+    def add_many(self, scores):
+        for score in scores:
+            self.add(score)
+
+    def interval(self):
+        if self.n == 0:
+            return 0.0, 1.0
+        variance = self.m2 / (self.n - 1) if self.n > 1 else 0.0
+        half = self.z * math.sqrt(max(variance, MIN_VARIANCE) / self.n)
+        return self.mean - half, self.mean + half
+
+    def decision(self):
+        """"above" / "below" once the interval clears the threshold, else None."""
+        if self.n < self.min_samples:
+            return None
+        low, high = self.interval()
+        if low > self.threshold:
+            return "above"
+        if high <= self.threshold:
+            return "below"
+        return None
+
+    def could_stop(self, pending):
+        """True when `pending` more scores could decide the test or reach max_samples."""
+        needed = self.min_samples
+        if self.max_samples:
+            needed = min(needed, self.max_samples)
+        return pending > 0 and self.n + pending >= needed
+
+    def room(self, pending):
+        """How many of `pending` scores to take without going past max_samples."""
+        if self.max_samples:
+            return max(0, min(pending, self.max_samples - self.n))
+        return pending
+
+    def done(self):
+        if self.max_samples and self.n >= self.max_samples:
+            return True
+        return self.decision() is not None
+
+    def summary(self):
+        low, high = self.interval()
+        return {
+            "samples": self.n,
+            "mean": round(self.mean, 4),
+            "interval": [round(max(0.0, low), 4), round(min(1.0, high), 4)],
+            "decision": self.decision(),
+        }
@@ -1,95 +1,36 @@
 import os
-import hashlib
-from flask import Flask, request, jsonify
-from werkzeug.utils import secure_filename
-from blockchain import Blockchain
+from flask import Flask, request, jsonify, Response, stream_with_context
+from blockchain import Blockchain, block_header, block_records
+from verdict_cache import VerdictCache
+from ingest import ChunkedUploads, UploadError, store_upload
+from analyzer import DETECTOR_MODEL, analyze_video, warm_up
+from jobs import JobQueue, QueueError
+from ledger import Ledger
+from mempool import Mempool, MempoolFull, VoteError
+from scheduler import DeadlineScheduler
+from events import EventBus
+from validator_selection import ValidatorSampler
+from consensus import ConsensusPolicy, hybrid_consensus
+from sync import ChainSync
+from node_registry import NodeRegistry, RegistryError
+import gzip
+import hmac
 import json
+from urllib.parse import urlsplit
 import time
-import random
-import math
-
-# --- Load Libraries ---
-
-import cv2
-from transformers import pipeline
-from PIL import Image
-
-    # 1. โหลดตัวจับหน้าคน
-human_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    # 2. โหลดตัวจับหน้าแมว
-cat_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalcatface.xml')
-    # 3. โหลด AI
-deepfake_detector = pipeline("image-classification", model="prithivMLmods/Deep-Fake-Detector-v2-Model")
-
-# ==========================================
-# 🧠 ส่วนที่ 1: ระบบ AI (แก้บั๊ก Score แล้ว)
-# ==========================================
-
-def analyze_video(video_path):
-
-    cap = cv2.VideoCapture(video_path)
-    fake_scores = []
-   
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    step = max(5, total_frames // 15) 
-
-    for i in range(0, total_frames, step):
-        cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-        ret, frame = cap.read()
-        if not ret: break
-
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # หาคนก่อน
-        faces = human_cascade.detectMultiScale(gray, 1.1, 4)
-        face_type = "HUMAN"
-
-        for (x, y, w, h) in faces:
-            if w < 60: continue 
-
-            face = frame[y:y+h, x:x+w]
-            rgb = cv2.cvtColor(face, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(rgb)
-
-            results = deepfake_detector(pil_image)
-
-            fake_score = 0.0
-            for r in results:
-                label = r["label"].upper()
-                if "FAKE" in label or "AI" in label or "0" in label:
-                    fake_score = r["score"]
-                    break
-                elif "REAL" in label or "HUMAN" in label or "1" in label:
-                    fake_score = 1.0 - r["score"]
-
-            fake_scores.append(fake_score)
-                
-    cap.release()
-    
-    if not fake_scores:
-            return "REAL", 50.0
-    
-    avg = sum(fake_scores) / len(fake_scores)
-    if avg > 0.55:
-        return "FAKE", round(avg * 100, 2)
-    
-    return "REAL", round((1.0 - avg) * 100, 2)
+import threading
+
+# ไฟล์ข้อมูลทั้งหมดอยู่ใต้ DATA_DIR (รันหลาย node บนเครื่องเดียวได้)
+DATA_DIR = os.environ.get("DATA_DIR", ".")
+os.makedirs(DATA_DIR, exist_ok=True)
 
-#
-           
 
-USERS_FILE = "users.json"
-NODES_FILE = "nodes.json"
+def data_path(name):
+    return os.path.join(DATA_DIR, name)
 
-def load_users():
-    if not os.path.exists(USERS_FILE):
-        return {}
-    with open(USERS_FILE, "r") as f:
-        return json.load(f)
 
-def save_users(users):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=2)
+USERS_FILE = data_path("users.json")
+NODES_FILE = data_path("nodes.json")
 
 def get_user(users, user_id):
     if user_id not in users:
@@ -107,29 +48,67 @@ def get_user(users, user_id):
     return users[user_id]
 
 
-def load_nodes():
-    if not os.path.exists(NODES_FILE):
-        return set()
-    with open(NODES_FILE, "r") as f:
-        data = json.load(f)
-        return set(data.get("nodes", []))
-
-def save_nodes(nodes):
-    with open(NODES_FILE, "w") as f:
-        json.dump({"nodes": list(nodes)}, f, indent=2)
-
-
-UPLOAD_FOLDER = "uploads"
+UPLOAD_FOLDER = data_path("uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 app = Flask(__name__)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
-blockchain = Blockchain()
-pending_block = None
-NODES = load_nodes()
-
-REQUIRED_VOTES = math.ceil (len(NODES) * 2 / 3)
+UPLOAD_FEE = 20
+# เริ่มวิเคราะห์ส่วนต้นของไฟล์เมื่อได้รับครบเท่านี้ (byte, 0 = ปิด)
+UPLOAD_PREFIX_ANALYSIS = int(os.environ.get("UPLOAD_PREFIX_ANALYSIS", 16 * 1024 * 1024))
+
+MODEL_ID = "Demo Deepfake Detector"
+
+# สุ่มผู้ชนะตาม reputation, ตั้ง SELECTION_SEED เพื่อให้ผลสุ่มซ้ำได้ (audit)
+SELECTION_SEED = os.environ.get("SELECTION_SEED")
+BLOCK_BATCH_SIZE = int(os.environ.get("BLOCK_BATCH_SIZE", 8))
+BLOCK_MAX_WAIT = float(os.environ.get("BLOCK_MAX_WAIT", 2))
+# ดึง block ที่ขาดจาก peer (SYNC_PEERS = url คั่นด้วย comma)
+SYNC_PEERS = [p for p in os.environ.get("SYNC_PEERS", "").split(",") if p.strip()]
+# ผู้ดูแล node ใช้ token นี้อนุมัติ node ที่ลงทะเบียนเป็น peer (ไม่ตั้ง = เพิ่ม peer ได้จาก config เท่านั้น)
+PEER_ADMIN_TOKEN = os.environ.get("PEER_ADMIN_TOKEN")
+
+
+def init_state():
+    """Open the node's data files and build the state shared by the routes."""
+    global uploads, blockchain, ledger, validator_sampler, consensus_policy, verdict_cache
+    global analysis_jobs, mempool, ready_records, state_lock, scheduler, events, chain_sync
+    global node_registry
+
+    # อัปโหลดเป็น chunk ต่อได้เมื่อหลุด (uploads/sessions)
+    uploads = ChunkedUploads(UPLOAD_FOLDER)
+    blockchain = Blockchain(data_path("blockchain.json"), data_path("chain_log"))
+    # ยอดเงิน / reputation ของผู้ใช้ (users.json ใช้ import ครั้งแรกเท่านั้น)
+    ledger = Ledger(data_path("ledger.db"), import_file=USERS_FILE)
+    validator_sampler = ValidatorSampler(seed=SELECTION_SEED)
+    # น้ำหนัก AI / คน และเกณฑ์ REAL (CONSENSUS_AI_WEIGHT, CONSENSUS_HUMAN_WEIGHT, CONSENSUS_THRESHOLD)
+    consensus_policy = ConsensusPolicy.from_env()
+    validator_sampler.update_many(ledger.snapshot())
+    ledger.on_commit(validator_sampler.update_many)
+    # key ตามโมเดลที่ใช้วิเคราะห์จริง เปลี่ยนโมเดลแล้วผลเก่าจะไม่ถูกใช้
+    verdict_cache = VerdictCache(data_path("verdict_cache.db"), max_entries=5000)
+    # worker แต่ละตัวโหลดโมเดลครั้งเดียวตอนเริ่ม process
+    analysis_jobs = JobQueue(analyze_video, initializer=warm_up)
+    # รายการที่รอโหวต (หลายวิดีโอพร้อมกัน) key = video_hash
+    mempool = Mempool()
+    # รายการที่ได้ฉันทามติแล้ว รอแพ็คลง block ทีละหลายรายการ: [(record, queued_at)]
+    ready_records = []
+    # ล็อกสถานะ consensus (mempool, ready_records, chain)
+    state_lock = threading.RLock()
+    # ปิดโหวต / แพ็ค block ตรงเวลา ไม่ต้องรอให้มีคนมา poll
+    scheduler = DeadlineScheduler()
+    events = EventBus()
+    chain_sync = ChainSync(blockchain, SYNC_PEERS, lock=state_lock,
+                           on_change=lambda *args: on_chain_synced(*args))
+    # validator nodes (nodes.json ใช้ import ครั้งแรกเท่านั้น)
+    node_registry = NodeRegistry(data_path("nodes.jsonl"), import_file=NODES_FILE)
+
+
+# worker ของ analysis_jobs (spawn) รันไฟล์ที่เป็น __main__ ซ้ำในชื่อ __mp_main__
+# ห้ามเปิด chain / ledger / uploads ซ้ำใน worker (จะแก้ไฟล์ที่ process หลักเขียนอยู่)
+if __name__ != "__mp_main__":
+    init_state()
 
 def consensus_reached(votes):
 
@@ -139,7 +118,7 @@ def consensus_reached(votes):
     # agree = sum(1 for v in votes if v["vote"] == "AGREE")
     # # return agree > len(NODES) / 2
     # return agree >= (len(NODES) // 2 + 1)
-    return len(votes) >= (len(NODES) // 2 + 1)
+    return len(votes) >= node_registry.quorum()
 
 @app.route("/")
 def home():
@@ -147,7 +126,31 @@ def home():
         "message": "Welcome to the AI Video Verification Blockchain Server",
         "endpoints": {
             "POST /upload_video": "Upload video → AI verify → add new block",
-            "GET /chain": "View blockchain"
+            "POST /uploads": "Start a resumable upload {filename, size, uploader, prediction}",
+            "PUT /uploads/<id>": "Send a chunk (Upload-Offset, X-Chunk-SHA256 headers)",
+            "GET /uploads/<id>": "Offset to resume a chunked upload from",
+            "POST /uploads/<id>/complete": "Finish a chunked upload → AI verify {sha256}",
+            "GET /jobs/<id>": "Status / result of a video analysis job",
+            "GET /pending_block": "Videos waiting for votes",
+            "POST /vote": "Vote on a pending video {node, vote, item_id}",
+            "POST /register_node": "Register a validator node {node, stake, url}",
+            "POST /heartbeat": "Keep a node live for quorum {node}",
+            "GET /nodes": "Registered nodes with liveness",
+            "GET /events": "Server-sent event feed (resume with Last-Event-ID)",
+            "GET /events/poll": "Long-poll event feed (?cursor=&timeout=)",
+            "POST /warmup": "Start analysis workers and load models now",
+            "GET /analysis/stats": "Average frames / faces analysed per video",
+            "GET /chain": "View blockchain (?from=&limit= to paginate, ?format=jsonl to stream)",
+            "GET /chain/since/<index>": "Blocks after <index> (delta sync)",
+            "GET /chain/tip": "Index and hash of the last block",
+            "POST /sync": "Pull missing blocks from peers now",
+            "GET|POST /peers": "List peers used for chain sync / add a registered node as peer {node} (X-Admin-Token)",
+            "GET /block/<index>": "View one block",
+            "GET /block/<index>/header": "Block header only (for light clients)",
+            "GET /proof/<sha256>": "Merkle inclusion proof of a video's record",
+            "GET /video/<sha256>": "Lookup verification of a video",
+            "GET /uploader/<id>/blocks": "Records uploaded by a user, with block index / position",
+            "GET /verdict/<verdict>/blocks": "Records with a final verdict, with block index / position"
         }
     }
 
@@ -155,43 +158,128 @@ def home():
 @app.route("/upload_video", methods=["POST"])
 def upload_video():
 
-    UPLOAD_FEE = 20
-
     prediction = request.form.get("prediction")  # REAL / FAKE
 
-    users = load_users()
-    
     uploader = request.form.get("uploader", "anonymous")
-    uploader_user = get_user(users, uploader)
 
-    if uploader_user["balance"] < UPLOAD_FEE:
-        return jsonify({
-            "error": "Insufficient balance to upload video"
-        }), 403
+    # ไม่มีไฟล์ก็ไม่หักค่าธรรมเนียม
+    if "video" not in request.files:
+        return jsonify({"error": "No video file"}), 400
+
+    with ledger.transaction() as users:
+        uploader_user = get_user(users, uploader)
 
-    uploader_user["balance"] -= UPLOAD_FEE
-    save_users(users)
+        if uploader_user["balance"] < UPLOAD_FEE:
+            return jsonify({
+                "error": "Insufficient balance to upload video"
+            }), 403
+
+        uploader_user["balance"] -= UPLOAD_FEE
 
     # if "video" not in request.files:
     #     return jsonify({"error": "No video file"}), 400
-    global pending_block
-
-    if "video" not in request.files:
-        return jsonify({"error": "No video file"}), 400
-    
-    uploader = request.form.get("uploader", "anonymous")
 
     file = request.files["video"]
-    filepath = os.path.join(UPLOAD_FOLDER, secure_filename(file.filename))
-    # filename = secure_filename(file.filename)
-    # filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-    file.save(filepath)
+    # เขียนลงดิสก์ทีละ chunk พร้อมคำนวณ SHA-256 ไปด้วย (อ่านไฟล์รอบเดียว)
+    try:
+        video_hash, filepath, _ = store_upload(file.stream, UPLOAD_FOLDER, file.filename)
+    except Exception:
+        refund_upload_fee(uploader, UPLOAD_FEE)
+        raise
 
+    return start_verification(video_hash, filepath, uploader, prediction)
 
-    with open(filepath, "rb") as f:
-        video_hash = hashlib.sha256(f.read()).hexdigest()
 
-    verdict, confidence = analyze_video(filepath)
+def start_verification(video_hash, filepath, uploader, prediction, prefix=None):
+    """
+    Reuse a known verdict or queue the analysis, then put the video into
+    the mempool. The upload fee must already be charged; it is refunded
+    when the video cannot be queued (queue full, workers unavailable or
+    any other submit error).
+
+    `prefix` ({job_id, key, path, bytes}) is the analysis a chunked upload
+    started on the part of the file received so far; its verdict is used
+    when the sequential test reached a decision, else the whole file is
+    analysed.
+    """
+    analysis, cache_source = lookup_analysis(video_hash)
+    if analysis is None and prefix is not None:
+        job = analysis_jobs.get(prefix["job_id"])
+        # job หายไป (server restart ระหว่างอัปโหลด) หรือเสร็จแล้ว: ไม่ต้องรอส่วนต้นอีก
+        if job is None or job["finished_at"] is not None:
+            remove_file(prefix["path"])
+            if job is not None and prefix_decided(job):
+                analysis, cache_source = prefix_result(job, prefix), "prefix"
+                verdict_cache.put(video_hash, DETECTOR_MODEL, analysis)
+                record_analysis_usage(analysis)
+            prefix = None
+
+    if analysis is not None:
+        try:
+            pending, created = create_pending_block(video_hash, analysis, uploader, prediction, UPLOAD_FEE)
+        except MempoolFull:
+            return jsonify({"error": "Too many pending verifications, try again later"}), 503
+        return jsonify({
+            "message": "Block created successfully" if created else "Video is already pending, fee refunded",
+            "pending_block": pending,
+            "analysis_source": cache_source,
+            "face_scores": analysis.get("face_scores", [])
+        }), 202
+
+    # วิเคราะห์ใน worker process แล้วค่อยสร้าง pending block เมื่อเสร็จ
+    def on_done(job, result=None):
+        if job["status"] != "done":
+            refund_upload_fee(uploader, UPLOAD_FEE)
+            return
+        result = result or job["result"]
+        verdict_cache.put(video_hash, DETECTOR_MODEL, result)
+        record_analysis_usage(result)
+        try:
+            create_pending_block(video_hash, result, uploader, prediction, UPLOAD_FEE)
+        except MempoolFull:
+            pass  # ค่าธรรมเนียมคืนแล้วใน create_pending_block
+
+    # ส่วนต้นของไฟล์ยังวิเคราะห์ไม่เสร็จ: รอผลนั้นก่อน ถ้ายังตัดสินไม่ได้ค่อยวิเคราะห์ทั้งไฟล์
+    def on_prefix(job):
+        remove_file(prefix["path"])
+        if prefix_decided(job):
+            on_done(job, prefix_result(job, prefix))
+            return
+        try:
+            analysis_jobs.submit(video_hash, filepath, callback=on_done)
+        except QueueError:
+            refund_upload_fee(uploader, UPLOAD_FEE)
+        except Exception:
+            refund_upload_fee(uploader, UPLOAD_FEE)
+            raise
+
+    try:
+        if prefix is not None:
+            job = analysis_jobs.submit(prefix["key"], prefix["path"], callback=on_prefix)
+        else:
+            job = analysis_jobs.submit(video_hash, filepath, callback=on_done)
+    except QueueError as e:
+        refund_upload_fee(uploader, UPLOAD_FEE)
+        return jsonify({"error": f"{e}, try again later"}), 503
+    except Exception:
+        # ส่งงานไม่ได้ด้วยเหตุอื่น: คืนค่าธรรมเนียมก่อนตอบ 500
+        refund_upload_fee(uploader, UPLOAD_FEE)
+        raise
+
+    return jsonify({
+        "message": "Video queued for analysis",
+        "video_hash": video_hash,
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/jobs/{job['id']}"
+    }), 202
+
+
+def create_pending_block(video_hash, analysis, uploader, prediction, fee):
+    """
+    Put a verification into the mempool. Returns (item, created); when the
+    video is already pending (or the mempool is full) the fee is refunded.
+    """
 
     # block_data = {
     #     "video_hash": video_hash,
@@ -200,124 +288,529 @@ def upload_video():
     #     "model": "Demo Deepfake Detector"
     # }
 
-    # new_block = blockchain.create_block(block_data)
-    # global pending_block
+    data = {
+        "video_hash": video_hash,
+        "verdict": analysis["verdict"],
+        "confidence": analysis["confidence"],
+        "uploader": uploader,
+        "prediction": prediction,
+        "model": MODEL_ID,
+        "detector_model": DETECTOR_MODEL,
+        "created_at": time.time(),
+    }
 
-    pending_block = {
-        "data": {
-            "video_hash": video_hash,
-            "verdict": verdict,
-            "confidence": confidence,
-            "uploader": uploader,
-            "prediction": prediction,
-            "model": "Demo Deepfake Detector",
-            "created_at": time.time(),
-        },
-        "votes": [],
-        "uploader_pool": UPLOAD_FEE
+    try:
+        item, created = mempool.add(video_hash, data, fee)
+    except MempoolFull:
+        refund_upload_fee(uploader, fee)
+        raise
+
+    if created:
+        scheduler.schedule(("expire", video_hash), item["deadline"], check_timeout_and_finalize)
+        events.publish("pending_created", public_item(item))
+    else:
+        refund_upload_fee(uploader, fee)
+    return public_item(item), created
+
+
+def public_item(item):
+    return {
+        **item,
+        "votes": list(item["votes"]),
+        "remaining_time": mempool.remaining_time(item)
     }
 
+
+def refund_upload_fee(uploader, fee):
+    with ledger.transaction() as users:
+        get_user(users, uploader)["balance"] += fee
+
+
+def lookup_analysis(video_hash):
+    """
+    Return ({verdict, confidence, ...}, source) when the video was already
+    analysed: source is "chain" if it is recorded on chain, "cache" if it
+    is in the verdict cache. Returns (None, None) otherwise.
+    """
+    found = blockchain.find_record(video_hash)
+    # MODEL_ID เป็นแค่ชื่อที่แสดง ใช้ผลบน chain ซ้ำเมื่อเป็นโมเดลตัวเดียวกันจริง
+    if found is not None and found[2].get("detector_model") == DETECTOR_MODEL:
+        data = found[2]
+        return {"verdict": data["verdict"], "confidence": data["confidence"]}, "chain"
+
+    cached = verdict_cache.get(video_hash, DETECTOR_MODEL)
+    if cached is not None:
+        return cached, "cache"
+
+    return None, None
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def prefix_decided(job):
+    return job["status"] == "done" and job["result"]["sequential"]["decision"] is not None
+
+
+def prefix_result(job, prefix):
+    return {**job["result"], "prefix_bytes": prefix["bytes"]}
+
+
+def upload_error(e):
+    return jsonify({"error": str(e), **e.info}), e.status
+
+
+@app.route("/uploads", methods=["POST"])
+def create_upload():
+    data = request.get_json(silent=True) or request.form
+    uploader = data.get("uploader", "anonymous")
+    size = data.get("size")
+
+    try:
+        size = int(size) if size is not None else None
+    except ValueError:
+        return jsonify({"error": "size must be an integer"}), 400
+
+    # ค่าธรรมเนียมหักตอน complete แต่เช็คยอดเงินก่อนให้เริ่มส่งไฟล์
+    with ledger.transaction() as users:
+        if get_user(users, uploader)["balance"] < UPLOAD_FEE:
+            return jsonify({
+                "error": "Insufficient balance to upload video"
+            }), 403
+
+    session = uploads.create(
+        data.get("filename"),
+        size=size,
+        uploader=uploader,
+        prediction=data.get("prediction")
+    )
     return jsonify({
-        "message": "Block created successfully",
-        # "block": new_block
-        "pending_block": pending_block
-    }), 202
+        **session,
+        "chunk_limit": uploads.max_chunk,
+        "upload_url": f"/uploads/{session['id']}"
+    }), 201
+
+
+@app.route("/uploads/<upload_id>", methods=["GET"])
+def get_upload(upload_id):
+    try:
+        return jsonify(uploads.get(upload_id))
+    except UploadError as e:
+        return upload_error(e)
+
+
+@app.route("/uploads/<upload_id>", methods=["PUT"])
+def put_upload_chunk(upload_id):
+    offset = request.headers.get("Upload-Offset", request.args.get("offset"))
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Upload-Offset header (or ?offset=) is required"}), 400
+
+    try:
+        # อ่าน body เป็น stream ไม่ต้องเก็บทั้ง chunk ในหน่วยความจำ
+        session = uploads.write_chunk(
+            upload_id, offset, request.stream, request.headers.get("X-Chunk-SHA256")
+        )
+        analyze_prefix(session)
+    except UploadError as e:
+        return upload_error(e)
+
+    return jsonify(session)
+
+
+def analyze_prefix(session):
+    """Start analysing the received part of the file once UPLOAD_PREFIX_ANALYSIS bytes are in."""
+    # prefix_job จาก process ก่อน restart ไม่มีใน analysis_jobs แล้ว เริ่มใหม่ได้
+    if (
+        not UPLOAD_PREFIX_ANALYSIS
+        or (session.get("prefix_job") and analysis_jobs.get(session["prefix_job"]) is not None)
+        or session["offset"] < UPLOAD_PREFIX_ANALYSIS
+        or session["offset"] == session["size"]
+    ):
+        return
+
+    path, received = uploads.snapshot_prefix(session["id"])
+    key = f"prefix:{session['id']}"
+    try:
+        job = analysis_jobs.submit(key, path)
+    except QueueError:
+        remove_file(path)  # ไว้ลองใหม่ตอน chunk ถัดไป
+        return
+    uploads.update(session["id"], prefix_job=job["id"], prefix_key=key,
+                   prefix_path=path, prefix_bytes=received)
+
+
+@app.route("/uploads/<upload_id>/complete", methods=["POST"])
+def complete_upload(upload_id):
+    data = request.get_json(silent=True) or request.form
+
+    try:
+        session = uploads.get(upload_id)
+    except UploadError as e:
+        return upload_error(e)
+
+    uploader = session["uploader"]
+    with ledger.transaction() as users:
+        uploader_user = get_user(users, uploader)
+        if uploader_user["balance"] < UPLOAD_FEE:
+            return jsonify({
+                "error": "Insufficient balance to upload video"
+            }), 403
+        uploader_user["balance"] -= UPLOAD_FEE
+
+    try:
+        video_hash, filepath, _, session = uploads.complete(upload_id, data.get("sha256"))
+    except UploadError as e:
+        refund_upload_fee(uploader, UPLOAD_FEE)
+        return upload_error(e)
+
+    prefix = None
+    if session.get("prefix_job"):
+        prefix = {
+            "job_id": session["prefix_job"],
+            "key": session["prefix_key"],
+            "path": session["prefix_path"],
+            "bytes": session["prefix_bytes"],
+        }
+    return start_verification(video_hash, filepath, uploader, session.get("prediction"), prefix=prefix)
+
+
+@app.route("/warmup", methods=["POST"])
+def warmup():
+    started = time.time()
+    pids = analysis_jobs.warm_up()
+    return jsonify({
+        "message": "Analysis workers ready",
+        "workers": pids,
+        "seconds": round(time.time() - started, 3)
+    }), 200
+
+
+# ใช้วัดว่า early exit ประหยัดไปเท่าไร (เฉลี่ยเฟรม / หน้า ต่อวิดีโอ)
+analysis_usage = {"videos": 0, "frames_used": 0, "faces_used": 0, "early_exits": 0}
+usage_lock = threading.Lock()
+
+
+def record_analysis_usage(result):
+    with usage_lock:
+        analysis_usage["videos"] += 1
+        analysis_usage["frames_used"] += result.get("frames_used", 0)
+        analysis_usage["faces_used"] += result.get("faces_used", 0)
+        analysis_usage["early_exits"] += 1 if result.get("early_exit") else 0
+
+
+@app.route("/analysis/stats", methods=["GET"])
+def get_analysis_stats():
+    with usage_lock:
+        usage = dict(analysis_usage)
+    videos = usage["videos"] or 1
+    return jsonify({
+        **usage,
+        "avg_frames_per_video": round(usage["frames_used"] / videos, 2),
+        "avg_faces_per_video": round(usage["faces_used"] / videos, 2),
+        "early_exit_rate": round(usage["early_exits"] / videos, 3),
+        "jobs": analysis_jobs.stats()
+    })
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+MAX_PAGE_SIZE = 500
+GZIP_MIN_SIZE = 1024
+
+
+@app.after_request
+def compress_chain_response(response):
+    # บีบอัดหน้า block ที่ส่งให้ peer / client (JSON บีบได้ราว 5-10 เท่า)
+    if (
+        request.path.startswith("/chain")
+        and response.status_code == 200
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and "gzip" in request.accept_encodings
+        and "Content-Encoding" not in response.headers
+    ):
+        data = response.get_data()
+        if len(data) >= GZIP_MIN_SIZE:
+            response.set_data(gzip.compress(data, compresslevel=5))
+            response.headers["Content-Encoding"] = "gzip"
+            response.vary.add("Accept-Encoding")
+    return response
+
+
+def chain_etag():
+    # chain เป็น append-only ดังนั้น hash ของ block ล่าสุดพอสำหรับ ETag
+    return blockchain.get_last_block()["hash"]
+
+
+def not_modified(etag):
+    return etag in request.if_none_match
+
+
+def page_args(default_from=0):
+    try:
+        start = int(request.args.get("from", default_from))
+        limit = int(request.args.get("limit", MAX_PAGE_SIZE))
+    except ValueError:
+        return None, None
+    if start < 0 or limit < 1:
+        return None, None
+    return start, min(limit, MAX_PAGE_SIZE)
+
+
+def page_response(start, limit):
+    blocks = blockchain.chain[start:start + limit]
+    next_from = start + len(blocks)
+    return jsonify({
+        "blocks": blocks,
+        "from": start,
+        "limit": limit,
+        "total": len(blockchain.chain),
+        "next": next_from if next_from < len(blockchain.chain) else None,
+        "tip": chain_etag()
+    })
+
+
+def stream_chain(jsonl):
+    # snapshot ความยาวไว้ก่อน block ใหม่ที่เข้ามาระหว่าง stream จะไม่ถูกส่ง
+    blocks = blockchain.chain[:len(blockchain.chain)]
+
+    def generate():
+        if jsonl:
+            for block in blocks:
+                yield json.dumps(block) + "\n"
+            return
+        yield "["
+        for i, block in enumerate(blocks):
+            yield ("," if i else "") + json.dumps(block)
+        yield "]"
+
+    mimetype = "application/x-ndjson" if jsonl else "application/json"
+    return Response(stream_with_context(generate()), mimetype=mimetype)
 
 
 @app.route("/chain", methods=["GET"])
 def get_chain():
-    return jsonify(blockchain.chain)
+    etag = chain_etag()
+    if not_modified(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
+
+    if "from" in request.args or "limit" in request.args:
+        start, limit = page_args()
+        if start is None:
+            return jsonify({"error": "Invalid from/limit"}), 400
+        response = page_response(start, limit)
+    else:
+        jsonl = (
+            request.args.get("format") == "jsonl"
+            or request.accept_mimetypes.best == "application/x-ndjson"
+        )
+        response = stream_chain(jsonl)
+
+    response.set_etag(etag)
+    return response
+
+
+@app.route("/chain/tip", methods=["GET"])
+def get_chain_tip():
+    return jsonify(chain_sync.local_tip())
+
+
+@app.route("/chain/since/<int:index>", methods=["GET"])
+def get_chain_since(index):
+    etag = chain_etag()
+    if not_modified(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
+
+    start, limit = page_args(default_from=index + 1)
+    if start is None:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    # ถ้ามีหลายหน้า ใช้ ?from=<next> ต่อได้
+    response = page_response(start, limit)
+    response.set_etag(etag)
+    return response
+
+
+@app.route("/block/<int:index>", methods=["GET"])
+def get_block(index):
+    block = blockchain.get_block(index)
+    if block is None:
+        return jsonify({"error": "Block not found"}), 404
+    return jsonify(block)
+
+
+@app.route("/block/<int:index>/header", methods=["GET"])
+def get_block_header(index):
+    block = blockchain.get_block(index)
+    if block is None:
+        return jsonify({"error": "Block not found"}), 404
+    return jsonify({**block_header(block), "hash": block["hash"]})
+
+
+@app.route("/video/<video_hash>", methods=["GET"])
+def get_video(video_hash):
+    found = blockchain.find_record(video_hash.lower())
+    if found is None:
+        return jsonify({
+            "video_hash": video_hash,
+            "verified": False
+        }), 404
+    block, position, record = found
+    return jsonify({
+        "video_hash": video_hash,
+        "verified": True,
+        "record": record,
+        "block_index": block["index"],
+        "block_hash": block["hash"]
+    })
+
+
+@app.route("/proof/<video_hash>", methods=["GET"])
+def get_proof(video_hash):
+    proof = blockchain.prove(video_hash.lower())
+    if proof is None:
+        return jsonify({"error": "Video not on chain"}), 404
+    if proof["proof"] is None:
+        return jsonify({
+            "error": "Block was created before Merkle roots, fetch the whole block",
+            "block_hash": proof["block_hash"]
+        }), 409
+    return jsonify(proof)
+
+
+@app.route("/uploader/<uploader>/blocks", methods=["GET"])
+def get_uploader_blocks(uploader):
+    records = blockchain.records_by_uploader(uploader)
+    return jsonify({
+        "uploader": uploader,
+        "records": records,
+        "total": len(records)
+    })
+
+
+@app.route("/verdict/<verdict>/blocks", methods=["GET"])
+def get_verdict_blocks(verdict):
+    records = blockchain.records_by_verdict(verdict.upper())
+    return jsonify({
+        "verdict": verdict.upper(),
+        "records": records,
+        "total": len(records)
+    })
 
 
 @app.route("/vote", methods=["POST"])
 def vote():
-    global pending_block
-    if pending_block is None:
-        return jsonify({"error": "No pending block"}), 400
-    
     # # data = request.json
     # node_id = data.get("node")
     # vote_value = data.get("vote")
-    data = request.get_json() or request.form
-    node = request.json.get("node")
-    vote = request.json.get("vote")
+    data = request.get_json(silent=True) or request.form
+    node = data.get("node")
+    vote = data.get("vote")
+    item_id = data.get("item_id") or data.get("video_hash")
 
     if vote not in ["REAL", "FAKE"]:
         return jsonify({"error": "Invalid vote value"}), 400
 
 
-    if node not in NODES:
+    if node not in node_registry:
         return jsonify({"error": "Unknown node"}), 400
     
     if not node or not vote:
         return jsonify({"error": "Missing data"}), 400
-    
 
-    # กันโหวตซ้ำ
-    if any(v["node"] == node for v in pending_block["votes"]):
-        return jsonify({"error": "Node already voted"}), 400
-
-    pending_block["votes"].append({
-        "node": node,
-        "vote": vote
-    })
-    result = check_timeout_and_finalize()
-    if result:
-        return jsonify(result), 201
+    with state_lock:
+        if item_id is None:
+            # ไม่ระบุ item_id ได้เฉพาะตอนมีรายการเดียว (client แบบเดิม)
+            items = mempool.all()
+            if not items:
+                return jsonify({"error": "No pending block"}), 400
+            if len(items) > 1:
+                return jsonify({"error": "item_id required, several blocks are pending"}), 400
+            item_id = items[0]["id"]
+
+        try:
+            # หมดเวลาแล้วโหวตไม่ได้ (scheduler จะปิดรายการเอง)
+            item = mempool.vote(item_id, node, vote)
+        except VoteError as e:
+            return jsonify({"error": str(e)}), 400
+
+        events.publish("vote_recorded", {
+            "item_id": item_id,
+            "node": node,
+            "vote": vote,
+            "current_votes": len(item["votes"])
+        })
+
+        # return jsonify({
+        #     "message": "Vote recorded",
+        #     "current_votes": len(pending_block["votes"])
+        # }), 200
+
+        # เมื่อมี vote ครบขั้นต่ำ (นับเฉพาะ node ที่ยัง online)
+        node_registry.touch(node)
+        required_votes = node_registry.quorum()
+
+        if len(item["votes"]) >= required_votes:
+            result = finalize_by_votes(item)
+            result["required_votes"] = required_votes
+            return jsonify(result), 201
 
-    # return jsonify({
-    #     "message": "Vote recorded",
-    #     "current_votes": len(pending_block["votes"])
-    # }), 200
+    return jsonify({
+        "message": "Vote recorded",
+        "item_id": item_id,
+        "current_votes": len(item["votes"])
+    }), 200
 
 
+def finalize_by_votes(item):
     # ----- HYBRID CONSENSUS -----
-    ai_verdict = pending_block["data"]["verdict"]
-    ai_confidence = pending_block["data"]["confidence"]
-
-    # เมื่อมี vote ครบขั้นต่ำ
-    REQUIRED_VOTES = len(NODES) // 2 + 1
-
-    if len(pending_block["votes"]) >= REQUIRED_VOTES:
-
-        ai_verdict = pending_block["data"]["verdict"]
-        ai_confidence = pending_block["data"]["confidence"]
-
-        # final_result, final_score = hybrid_consensus(
-        #     ai_verdict,
-        #     ai_confidence,
-        #     pending_block["votes"]
-        # )
-        consensus = hybrid_consensus(
-            ai_verdict,
-            ai_confidence,
-            pending_block["votes"]
-        )
+    ai_verdict = item["data"]["verdict"]
+    ai_confidence = item["data"]["confidence"]
+
+    # final_result, final_score = hybrid_consensus(
+    #     ai_verdict,
+    #     ai_confidence,
+    #     item["votes"]
+    # )
+    consensus = hybrid_consensus(
+        ai_verdict,
+        ai_confidence,
+        item["votes"],
+        consensus_policy
+    )
 
-        final_result = consensus["final_result"]
-        final_score = consensus["final_score"]
+    final_result = consensus["final_result"]
+    final_score = consensus["final_score"]
 
 
-        users = load_users()
-        uploader = pending_block["data"]["uploader"]
+    # settlement ทั้งหมดของ block นี้ commit ครั้งเดียว
+    with ledger.transaction() as users:
+        uploader = item["data"]["uploader"]
         uploader_user = get_user(users, uploader)
 
-      
-
-        created_at = pending_block["data"]["created_at"]
-        if time.time() - created_at > 120:
-            users = load_users()
-            # winner = weighted_random_winner(NODES, users)
+  
 
         # users = load_users()
 
-        # uploader = pending_block["data"]["uploader"]
+        # uploader = item["data"]["uploader"]
         # uploader_user = get_user(users, uploader)
 
         # คนที่โหวตตรงกับผลสุดท้าย
         correct_voters = [
             v["node"]
-            for v in pending_block["votes"]
+            for v in item["votes"]
             if v["vote"] == final_result
         ]
         # winner = random.choice(correct_voters) if correct_voters else None
@@ -326,7 +819,7 @@ def vote():
         winner = weighted_random_winner(correct_voters, users)
 
         #กูเพิ่มโค้ดตรงนี้มาเอง
-        pool = pending_block.get("uploader_pool", 0)
+        pool = item.get("uploader_pool", 0)
         if winner and pool > 0:
             users[winner]["balance"] += pool
 
@@ -347,7 +840,7 @@ def vote():
             uploader_user["reward"] += 10
 
         # uploader_user["reputation"] += 1
-        if pending_block["data"]["prediction"] == final_result:
+        if item["data"]["prediction"] == final_result:
             uploader_user["balance"] += 10   # คืนบางส่วน
             uploader_user["reputation"] += 2
         else:
@@ -355,7 +848,7 @@ def vote():
 
 
         # รางวัล validator
-        for v in pending_block["votes"]:
+        for v in item["votes"]:
             voter = v["node"]
             voter_user = get_user(users, voter)
 
@@ -370,61 +863,219 @@ def vote():
                     voter_user["reward"] += 5
 
 
-        save_users(users)
+    # 🔗 เก็บผล hybrid รอแพ็คลง block
+    record = {
+        # **item["data"],
+        # "final_result": final_result,
+        # "consensus_score": final_score,
+        # "votes": item["votes"],
+        # "block_creator": winner   # 🧱 ผู้สร้าง block
+        **item["data"],
 
-        # 🔗 เพิ่ม block (เก็บผล hybrid)
-        new_block = blockchain.create_block(
-            data={
-                # **pending_block["data"],
-                # "final_result": final_result,
-                # "consensus_score": final_score,
-                # "votes": pending_block["votes"],
-                # "block_creator": winner   # 🧱 ผู้สร้าง block
-                **pending_block["data"],
+        # 🔹 AI
+        "ai_verdict": item["data"]["verdict"],
+        "ai_confidence": item["data"]["confidence"],
+        "ai_score": consensus["ai_score"],
+        "ai_weight": consensus["ai_weight"],
 
-                # 🔹 AI
-                "ai_verdict": pending_block["data"]["verdict"],
-                "ai_confidence": pending_block["data"]["confidence"],
-                "ai_score": consensus["ai_score"],
-                "ai_weight": consensus["ai_weight"],
+        # 🔹 HUMAN
+        "human_score": consensus["human_score"],
+        "human_weight": consensus["human_weight"],
+        # "votes": item["votes"],
 
-                # 🔹 HUMAN
-                "human_score": consensus["human_score"],
-                "human_weight": consensus["human_weight"],
-                # "votes": pending_block["votes"],
+        # 🔹 FINAL
+        "final_score": consensus["final_score"],
+        "final_result": consensus["final_result"],
 
-                # 🔹 FINAL
-                "final_score": consensus["final_score"],
-                "final_result": consensus["final_result"],
+        # 🔹 BLOCK
+        "block_creator": winner
 
-                # 🔹 BLOCK
-                "block_creator": winner
+    }
 
-            }
-        )
+    votes_count = len(item["votes"])
+    mempool.remove(item["id"])
+    scheduler.cancel(("expire", item["id"]))
+    block = queue_record(record)
 
-        votes_count = len(pending_block["votes"])
-        pending_block = None
+    result = {
+        "message": "Hybrid consensus reached",
+        "item_id": item["id"],
+        "status": "finalized",
+        "final_result": final_result,
+        "consensus_score": final_score,
+        "winner": winner,
+        "block": block,
+        "queued_for_block": block is None,
+        "current_votes": votes_count
+    }
+    events.publish("pending_finalized", result)
+    return result
+
+
+def queue_record(record):
+    """Queue a finalized record and pack blocks if the batch is due."""
+    with state_lock:
+        ready_records.append((record, time.time()))
+        blocks = pack_ready_blocks()
+        for block in blocks:
+            if any(r is record for r in block["data"]):
+                return block
+
+        # ยังไม่ครบ batch: ตั้งเวลาแพ็คเมื่อรายการแรกรอครบ BLOCK_MAX_WAIT
+        scheduler.schedule(("pack",), ready_records[0][1] + BLOCK_MAX_WAIT,
+                           lambda: pack_ready_blocks(force=True))
+        return None
 
-        return jsonify({
-            "message": "Hybrid consensus reached",
-            "final_result": final_result,
-            "consensus_score": final_score,
-            "winner": winner,
-            "block": new_block,
-            "current_votes": votes_count,
-            "required_votes": REQUIRED_VOTES
-
-        }), 201
+
+def pack_ready_blocks(force=False):
+    """
+    Write all ready records to the chain in one batch once BLOCK_BATCH_SIZE
+    records are waiting or the oldest has waited BLOCK_MAX_WAIT seconds.
+    """
+    with state_lock:
+        if not ready_records:
+            return []
+        waited = time.time() - ready_records[0][1]
+        if not force and len(ready_records) < BLOCK_BATCH_SIZE and waited < BLOCK_MAX_WAIT:
+            return []
+        records = [record for record, _ in ready_records]
+        ready_records.clear()
+        scheduler.cancel(("pack",))
+        # หนึ่ง block ต่อ BLOCK_BATCH_SIZE records
+        blocks = [
+            blockchain.create_block(records[i:i + BLOCK_BATCH_SIZE])
+            for i in range(0, len(records), BLOCK_BATCH_SIZE)
+        ]
+
+    for block in blocks:
+        events.publish("block_finalized", block)
+    return blocks
+
+
+def on_chain_synced(result, blocks, dropped):
+    """
+    Called after blocks from a peer were applied. Records from our own
+    blocks that lost a fork are queued again unless the new chain has them.
+    """
+    with state_lock:
+        queued = {record.get("video_hash") for record, _ in ready_records}
+        requeue = [
+            record
+            for block in dropped
+            for record in block_records(block)
+            if record.get("video_hash") not in blockchain.video_index
+            and record.get("video_hash") not in queued
+        ]
+    for record in requeue:
+        queue_record(record)
+
+    events.publish("chain_synced", {**result, "requeued": len(requeue)})
+    for block in blocks:
+        events.publish("block_finalized", block)
+
+
+@app.route("/sync", methods=["POST"])
+def sync_chain():
+    return jsonify(chain_sync.sync())
+
+
+@app.route("/peers", methods=["GET", "POST"])
+def peers():
+    # peer มาจาก config (SYNC_PEERS / --peer) หรือ node ที่ผู้ดูแลอนุมัติเท่านั้น
+    # peer ส่ง chain ที่ยาวกว่ามาแทนได้ จึงไม่รับจาก client ทั่วไป (ป้องกัน chain ปลอม / SSRF)
+    if request.method == "POST":
+        token = request.headers.get("X-Admin-Token", "")
+        if not PEER_ADMIN_TOKEN or not hmac.compare_digest(token, PEER_ADMIN_TOKEN):
+            return jsonify({"error": "Adding peers requires the operator's X-Admin-Token"}), 403
+        data = request.get_json(silent=True) or request.form
+        name = data.get("node")
+        node = node_registry.get(node_registry.by_name.get(name, name))
+        if node is None:
+            return jsonify({"error": "Unknown node"}), 404
+        if not node["url"] or not points_at(node["url"], node["ip"]):
+            return jsonify({"error": "Node has no url at its own address"}), 400
+        chain_sync.add_peer(node["url"])
     return jsonify({
-        "message": "Vote recorded",
-        "current_votes": len(pending_block["votes"])
-    }), 200
+        "peers": sorted(chain_sync.peers),
+        "last_sync": chain_sync.last_result
+    })
+
+
+EVENT_POLL_TIMEOUT = 25      # วินาที สำหรับ long-poll
+SSE_KEEPALIVE = 15           # วินาที
+
+
+def event_cursor():
+    value = request.headers.get("Last-Event-ID") or request.args.get("cursor") or request.args.get("last_event_id")
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+@app.route("/events", methods=["GET"])
+def stream_events():
+    """
+    Server-sent events: pending_created, vote_recorded, pending_finalized,
+    pending_discarded, block_finalized. Reconnecting clients send
+    Last-Event-ID and receive what they missed.
+    """
+    cursor = event_cursor()
+    if cursor is None:
+        cursor = events.last_id  # client ใหม่: เริ่มจากตอนนี้
+
+    def generate():
+        last_id = cursor
+        missed, complete = events.since(last_id)
+        if not complete:
+            # event เก่าหลุด buffer ไปแล้ว (หรือ cursor มาจากก่อน restart) ให้ client sync ใหม่จาก /chain
+            yield f"event: reset\ndata: {json.dumps({'last_id': events.last_id})}\n\n"
+            if not events.is_current(last_id):
+                last_id = events.first_id
+        for event in missed:
+            last_id = event["id"]
+            yield format_sse(event)
+
+        while True:
+            new, _ = events.wait(last_id, timeout=SSE_KEEPALIVE)
+            if not new:
+                yield ": keepalive\n\n"
+                continue
+            for event in new:
+                last_id = event["id"]
+                yield format_sse(event)
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+@app.route("/events/poll", methods=["GET"])
+def poll_events():
+    """Long-poll: waits up to ?timeout= seconds for events after ?cursor=."""
+    cursor = event_cursor()
+    if cursor is None:
+        cursor = events.last_id
+    try:
+        timeout = min(float(request.args.get("timeout", EVENT_POLL_TIMEOUT)), EVENT_POLL_TIMEOUT)
+    except ValueError:
+        timeout = EVENT_POLL_TIMEOUT
+
+    new, complete = events.wait(cursor, timeout=timeout)
+    if not events.is_current(cursor):
+        cursor = events.first_id
+    return jsonify({
+        "events": new,
+        "cursor": new[-1]["id"] if new else cursor,
+        "reset": not complete
+    })
+
 
 @app.route("/register_node", methods=["POST"])
 def register_node():
-    global NODES
-
     data = request.get_json(silent=True) or request.form
     node_name = data.get("node")
     # node = request.form.get("node")
@@ -433,182 +1084,197 @@ def register_node():
     if not node_name:
         return jsonify({"error": "Node name required"}), 400
 
-    node_id = f"{node_name}:{ip}"
+    try:
+        stake = int(data.get("stake", 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid stake"}), 400
 
-    for n in NODES:
-        existing_name, existing_ip = n.split(":")
-        if existing_name == node_name:
-            return jsonify({
-                "error": "Node name already exists"
-            }), 403
-
-    for n in NODES:
-        if n.endswith(f":{ip}"):
-            return jsonify({
-                "error": "This IP already registered a node"
-            }), 403
-    
+    url = data.get("url")
+    if url and not points_at(url, ip):
+        return jsonify({"error": "Node url must point at the registering node's own address"}), 400
 
-    if node_id  in NODES:
-        return jsonify({"message": "Node already registered"}), 200
+    try:
+        node, created = node_registry.register(node_name, ip, stake=stake, url=url)
+    except RegistryError as e:
+        return jsonify({"error": str(e)}), 403
 
-    NODES.add(node_id)
-    save_nodes(NODES)
+    if not created:
+        return jsonify({"message": "Node already registered", "node": node["id"]}), 200
 
-    global REQUIRED_VOTES
-    REQUIRED_VOTES = math.ceil(len(NODES) * 2 / 3)
+    # ไม่เพิ่มเป็น peer อัตโนมัติ: ผู้ดูแลอนุมัติผ่าน POST /peers
 
         # return {"message": "Node registered", "node": node_name, "nodes": list(nodes)}, 201
 
     return jsonify({
         "message": "Node registered",
-        "node": node_id,
-        "nodes": list(NODES)
+        "node": node["id"],
+        "nodes": list(node_registry.nodes)
     }), 201
 
+
+def points_at(url, ip):
+    """True when `url` is an http(s) url whose host is `ip`."""
+    if "://" not in url:
+        url = "http://" + url
+    try:
+        parts = urlsplit(url)
+        parts.port  # พอร์ตไม่ถูกต้อง -> ValueError
+    except ValueError:
+        return False
+    return parts.scheme in ("http", "https") and parts.hostname == ip
+
+
+@app.route("/heartbeat", methods=["POST"])
+def heartbeat():
+    data = request.get_json(silent=True) or request.form
+    node = data.get("node")
+    if not node_registry.touch(node):
+        return jsonify({"error": "Unknown node"}), 404
+    return jsonify({
+        "node": node,
+        "live_nodes": len(node_registry.live_ids()),
+        "required_votes": node_registry.quorum(),
+        "ttl": node_registry.ttl
+    })
+
+
 @app.route("/nodes", methods=["GET"])
 def get_nodes():
+    details = node_registry.public()
     return jsonify({
-        "nodes": list(NODES),
-        "total": len(NODES)
+        "nodes": [n["id"] for n in details],
+        "total": len(details),
+        "live": sum(1 for n in details if n["live"]),
+        "required_votes": node_registry.quorum(),
+        "details": details
     })
 
 
 @app.route("/pending_block", methods=["GET"])
 def get_pending_block():
-    result = check_timeout_and_finalize()
-    if result:
-        return jsonify(result), 200
-    
-    if pending_block is None:
+    with state_lock:
+        items = [public_item(item) for item in mempool.all()]
+        queued = len(ready_records)
+
+    if not items:
         return jsonify({
-            "message": "No pending block"
+            "message": "No pending block",
+            "queued_records": queued
         }), 200
 
     return jsonify({
-        "pending_block": pending_block,
-        "required_votes": len(NODES) // 2 + 1,
-        "total_nodes": len(NODES),
-        "remaining_time": max(0,120 - int(time.time() - pending_block["data"]["created_at"]))
+        "pending_blocks": items,
+        "queued_records": queued,
+        "required_votes": node_registry.quorum(),
+        "total_nodes": len(node_registry),
+        "live_nodes": len(node_registry.live_ids())
     }), 200
 
-def hybrid_consensus(ai_verdict, ai_confidence, votes):
-    """
-    ai_verdict: 'REAL' | 'FAKE' | 'UNCERTAIN'
-    ai_confidence: 0 - 100
-    votes: [{node, vote}]
-    """
 
-    # -------- AI SCORE (60%) --------
-    if ai_verdict == "REAL":
-        ai_score = ai_confidence / 100
-    elif ai_verdict == "FAKE":
-        ai_score = 1 - (ai_confidence / 100)
-    else:  # UNCERTAIN
-        ai_score = 0.5
-
-    ai_weighted = ai_score * 0.6
-
-    # -------- HUMAN SCORE (40%) --------
-    if not votes:
-        human_score = 0.5
-    else:
-        agree = sum(1 for v in votes if v["vote"] == "REAL")
-        human_score = agree / len(votes)
-
-    human_weighted = human_score * 0.4
-
-    # -------- FINAL --------
-    final_score = ai_weighted + human_weighted
-    final_result = "REAL" if final_score > 0.7 else "FAKE"
-
-    # return final_result, round(final_score, 3)
-    return {
-        "ai_score": round(ai_score, 3),
-        "ai_weight": ai_weighted,
-        "ai_weighted": round(ai_weighted, 3),
-
-        "human_score": round(human_score, 3),
-        "human_weight": human_weight,
-        "human_weighted": round(human_weighted, 3),
-
-        "final_score": round(final_score, 3),
-        "final_result": final_result
-    }
+@app.route("/pending_block/<item_id>", methods=["GET"])
+def get_pending_item(item_id):
+    item = mempool.get(item_id)
+    if item is None:
+        return jsonify({"error": "No pending block"}), 404
+    return jsonify({
+        "pending_block": public_item(item),
+        "required_votes": node_registry.quorum(),
+        "total_nodes": len(node_registry),
+        "live_nodes": len(node_registry.live_ids())
+    }), 200
 
 def weighted_random_winner(nodes, users):
-    candidates = []
     for n in nodes:
-        u = get_user(users, n)
-        last_win = u.get("last_win", 0)
-        if time.time() - last_win < 120:
-            continue  # ❌ ชนะติดกันไม่ได้
-        weight = max(1, u["reputation"])
-        candidates.extend([n] * weight)
+        get_user(users, n)
 
-    return random.choice(candidates) if candidates else None
+    # น้ำหนัก = reputation (ขั้นต่ำ 1), ชนะภายใน 120 วินาทีล่าสุดไม่มีสิทธิ์ ❌
+    return validator_sampler.choose(nodes)
 
 def check_timeout_and_finalize():
-    global pending_block
-
-    if pending_block is None:
-        return None
+    """
+    Finalize or discard every pending item whose voting window is over.
+    Called by the scheduler at each item's deadline.
+    """
+    with state_lock:
+        results = [finalize_expired(item) for item in mempool.expired()]
 
-    created_at = pending_block["data"]["created_at"]
+    for result in results:
+        if result["status"] == "discarded":
+            events.publish("pending_discarded", result)
+        else:
+            events.publish("pending_finalized", result)
+    return results
 
-    # ยังไม่ครบ 2 นาที
-    if time.time() - created_at < 120:
-        return None
 
-    votes = pending_block["votes"]
+def finalize_expired(item):
+    mempool.remove(item["id"])
+    votes = item["votes"]
 
     # ❌ ไม่มีคนโหวต
     if len(votes) == 0:
-        pending_block = None
         return {
+            "item_id": item["id"],
             "status": "discarded",
             "reason": "No votes"
         }
 
     # ✅ มีคนโหวต → สุ่ม winner
-    users = load_users()
     voters = [v["node"] for v in votes]
 
-    winner = weighted_random_winner(voters, users)
-
-    if not winner:
-        pending_block = None
-        return {
-            "status": "discarded",
-            "reason": "No eligible winner"
-        }
-
-    # 🎁 ให้รางวัล
-    winner_user = get_user(users, winner)
-    winner_user["reward"] += 20
-    winner_user["reputation"] += 3
-    winner_user["last_win"] = time.time()
-
-    save_users(users)
+    with ledger.transaction() as users:
+        winner = weighted_random_winner(voters, users)
 
-    # 🔗 สร้าง block
-    new_block = blockchain.create_block(
-        data={
-            **pending_block["data"],
-            "block_creator": winner,
-            # "votes": votes
-        }
-    )
+        if not winner:
+            return {
+                "item_id": item["id"],
+                "status": "discarded",
+                "reason": "No eligible winner"
+            }
 
-    pending_block = None
+        # 🎁 ให้รางวัล
+        winner_user = get_user(users, winner)
+        winner_user["reward"] += 20
+        winner_user["reputation"] += 3
+        winner_user["last_win"] = time.time()
+
+    # 🔗 รอแพ็คลง block
+    block = queue_record({
+        **item["data"],
+        "block_creator": winner,
+        # "votes": votes
+    })
 
     return {
+        "item_id": item["id"],
         "status": "finalized",
         "winner": winner,
-        "block": new_block
+        "block": block,
+        "queued_for_block": block is None
     }
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--warmup", action="store_true",
+                        help="load models in the analysis workers before serving")
+    parser.add_argument("--peer", action="append", default=[],
+                        help="peer server url for chain sync (repeatable)")
+    parser.add_argument("--no-reload", action="store_true",
+                        help="run without the debug reloader")
+    args = parser.parse_args()
+    use_reloader = not args.no_reload
+
+    if args.warmup:
+        analysis_jobs.warm_up()
+
+    for peer in args.peer:
+        chain_sync.add_peer(peer)
+    # debug reloader รันไฟล์นี้สองรอบ ให้ sync เฉพาะใน process ที่เสิร์ฟจริง
+    if not use_reloader or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        chain_sync.start(scheduler)
+
     # app.run(debug=True)
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(host="0.0.0.0", port=args.port, debug=True, use_reloader=use_reloader)
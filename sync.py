@@ -0,0 +1,241 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from blockchain import check_suffix
+
+SYNC_INTERVAL = float(os.environ.get("SYNC_INTERVAL", 30))   # วินาที, 0 = ปิด
+SYNC_TIMEOUT = float(os.environ.get("SYNC_TIMEOUT", 5))
+SYNC_PAGE_SIZE = int(os.environ.get("SYNC_PAGE_SIZE", 500))
+SYNC_MAX_PEERS = int(os.environ.get("SYNC_MAX_PEERS", 16))
+# block ท้าย chain ที่ sync แทนที่ได้มากที่สุด (fork ปกติสั้น), block ที่ลึกกว่านี้ถือว่า final
+SYNC_MAX_REORG = int(os.environ.get("SYNC_MAX_REORG", 6))
+
+
+class SyncError(Exception):
+    pass
+
+
+def better_tip(a, b):
+    """
+    Fork rule: the longer chain wins; on equal length the lower tip hash
+    wins, so every node settles on the same chain.
+
+    Blocks are not signed, so a longer chain is cheap to build: this rule
+    is only safe between trusted peers (see ChainSync).
+    """
+    return (a["length"], _neg(a["hash"])) > (b["length"], _neg(b["hash"]))
+
+
+def _neg(hex_hash):
+    # hash ต่ำกว่าชนะ -> เทียบด้วยค่าติดลบ
+    return -int(hex_hash, 16)
+
+
+class ChainSync:
+    """
+    Pulls blocks from peer servers.
+
+    A round asks every peer for its tip (index, hash) in parallel, picks
+    the best one by `better_tip`, finds the last block both chains share
+    (binary search over block hashes), then downloads only the blocks
+    after it in pages. Every page is checked as it arrives; the suffix is
+    applied under `lock` only if it still beats the local chain.
+
+    Trust: checks only prove that the blocks link up, not who made them,
+    so peers are trusted to serve honest chains. They come only from the
+    operator (config or an approved node), never from a client. A sync
+    never drops more than `max_reorg` local blocks, so even a bad peer
+    cannot rewrite verdicts older than that.
+    """
+
+    def __init__(self, blockchain, peers=(), lock=None, on_change=None,
+                 timeout=SYNC_TIMEOUT, page_size=SYNC_PAGE_SIZE, max_peers=SYNC_MAX_PEERS,
+                 max_reorg=SYNC_MAX_REORG):
+        self.blockchain = blockchain
+        self.max_reorg = max_reorg
+        self.lock = lock or threading.RLock()
+        self.on_change = on_change
+        self.timeout = timeout
+        self.page_size = page_size
+
+        self.peers = set()
+        for peer in peers:
+            self.add_peer(peer)
+
+        # connection pool ต่อ peer ใช้ซ้ำทุกรอบ (keep-alive)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_peers, pool_maxsize=max_peers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = "gzip"
+        self.pool = ThreadPoolExecutor(max_workers=max_peers)
+
+        self.round_lock = threading.Lock()
+        self.last_result = None
+
+    def add_peer(self, url):
+        url = url.rstrip("/")
+        if "://" not in url:
+            url = "http://" + url
+        self.peers.add(url)
+        return url
+
+    # ---------- peer requests ----------
+
+    def _get(self, peer, path, **params):
+        response = self.session.get(peer + path, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_tip(self, peer):
+        return self._get(peer, "/chain/tip")
+
+    def fetch_tips(self):
+        """Returns ({peer: tip}, {peer: error}) asking all peers at once."""
+        peers = sorted(self.peers)
+        futures = {peer: self.pool.submit(self.fetch_tip, peer) for peer in peers}
+        tips, errors = {}, {}
+        for peer, future in futures.items():
+            try:
+                tips[peer] = future.result()
+            except (requests.RequestException, ValueError) as e:
+                errors[peer] = str(e)
+        return tips, errors
+
+    def _hash_at(self, peer, index):
+        return self._get(peer, f"/block/{index}/header")["hash"]
+
+    def common_ancestor(self, peer, tip, chain):
+        """
+        Index of the last block `chain` shares with the peer, or -1 when
+        even the genesis blocks differ.
+        """
+        last = min(len(chain), tip["length"]) - 1
+        # กรณีปกติ: peer ต่อยอดจาก block ล่าสุดของเรา
+        if self._hash_at(peer, last) == chain[last]["hash"]:
+            return last
+
+        # hash chain: ถ้า block i ตรงกัน block ก่อนหน้าทั้งหมดก็ตรงด้วย
+        lo, hi = -1, last
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self._hash_at(peer, mid) == chain[mid]["hash"]:
+                lo = mid
+            else:
+                hi = mid
+        return lo
+
+    def fetch_blocks(self, peer, start, prev_hash, length):
+        """Download blocks [start, length) in pages, checking each page."""
+        blocks = []
+        next_from = start
+        while next_from is not None and next_from < length:
+            page = self._get(peer, "/chain", **{"from": next_from, "limit": self.page_size})
+            received = page["blocks"]
+            if not received:
+                break
+            check_suffix(received, next_from, prev_hash)
+            blocks.extend(received)
+            prev_hash = received[-1]["hash"]
+            next_from = page["next"]
+        if not blocks:
+            raise SyncError("peer returned no blocks")
+        return blocks
+
+    # ---------- sync ----------
+
+    def local_tip(self, chain=None):
+        chain = self.blockchain.chain if chain is None else chain
+        return {"index": len(chain) - 1, "hash": chain[-1]["hash"], "length": len(chain)}
+
+    def sync_with(self, peer, tip):
+        chain = self.blockchain.chain
+        ancestor = self.common_ancestor(peer, tip, chain)
+        if ancestor < 0:
+            # คนละ chain กันตั้งแต่ genesis: ไม่รับ ไม่ว่าจะยาวกว่าแค่ไหน
+            raise SyncError("peer has a different genesis block")
+        start = ancestor + 1
+        self._check_reorg(chain, start)
+        prev_hash = chain[ancestor]["hash"]
+        blocks = self.fetch_blocks(peer, start, prev_hash, tip["length"])
+
+        with self.lock:
+            chain = self.blockchain.chain
+            # chain ของเราอาจเปลี่ยนระหว่างดาวน์โหลด
+            if start > len(chain) or chain[start - 1]["hash"] != prev_hash:
+                raise SyncError("local chain changed during sync")
+            self._check_reorg(chain, start)
+            new_tip = {"length": start + len(blocks), "hash": blocks[-1]["hash"]}
+            if not better_tip(new_tip, self.local_tip(chain)):
+                return None
+            dropped = self.blockchain.replace_from(start, blocks, checked=True)
+
+        result = {
+            "status": "synced",
+            "peer": peer,
+            "from": start,
+            "received": len(blocks),
+            "dropped": len(dropped),
+            "tip": self.local_tip(),
+        }
+        if self.on_change is not None:
+            self.on_change(result, blocks, dropped)
+        return result
+
+    def _check_reorg(self, chain, start):
+        dropped = len(chain) - start
+        if dropped > self.max_reorg:
+            raise SyncError(f"peer chain would replace {dropped} local blocks (max {self.max_reorg})")
+
+    def sync(self):
+        """One sync round. Returns a summary of what happened."""
+        if not self.round_lock.acquire(blocking=False):
+            return {"status": "busy"}
+        try:
+            started = time.time()
+            tips, errors = self.fetch_tips()
+            local = self.local_tip()
+            candidates = sorted(
+                (peer for peer, tip in tips.items() if better_tip(tip, local)),
+                key=lambda peer: (-tips[peer]["length"], tips[peer]["hash"]),
+            )
+
+            result = None
+            for peer in candidates:
+                try:
+                    result = self.sync_with(peer, tips[peer])
+                except (requests.RequestException, SyncError, ValueError, KeyError) as e:
+                    errors[peer] = str(e)
+                    continue
+                if result is not None:
+                    break
+
+            if result is None:
+                result = {"status": "up_to_date", "tip": self.local_tip()}
+            result["peers"] = len(self.peers)
+            result["errors"] = errors
+            result["seconds"] = round(time.time() - started, 3)
+            self.last_result = result
+            return result
+        finally:
+            self.round_lock.release()
+
+    def sync_in_background(self):
+        threading.Thread(target=self.sync, daemon=True).start()
+
+    def start(self, scheduler, interval=SYNC_INTERVAL):
+        """Run a sync round every `interval` seconds via the deadline scheduler."""
+        if interval <= 0:
+            return
+
+        def tick():
+            # รอบ sync ใช้ network ไม่รันใน thread ของ scheduler
+            self.sync_in_background()
+            scheduler.schedule(("sync",), time.time() + interval, tick)
+
+        scheduler.schedule(("sync",), time.time(), tick)
@@ -0,0 +1,62 @@
+import bisect
+import random
+import threading
+import time
+
+COOLDOWN = 120  # วินาที ชนะติดกันไม่ได้
+
+
+class ValidatorSampler:
+    """
+    Reputation-weighted validator selection.
+
+    Weights (max(1, reputation)) and last-win times are cached and updated
+    incrementally from ledger commits, so a draw does not rebuild a list
+    with one entry per reputation point: it is a cumulative sum + bisect
+    over the k candidates, O(k) whatever the number of accounts. Nodes
+    that won in the last COOLDOWN seconds are not eligible. Pass `seed`
+    for a reproducible sequence of draws (audits).
+    """
+
+    def __init__(self, seed=None, cooldown=COOLDOWN):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.cooldown = cooldown
+        self.weights = {}
+        self.last_win = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def weight_of(account):
+        return max(1, account.get("reputation", 0))
+
+    def update(self, node, account):
+        with self.lock:
+            self._update(node, account)
+
+    def _update(self, node, account):
+        self.weights[node] = self.weight_of(account)
+        self.last_win[node] = account.get("last_win", 0)
+
+    def update_many(self, accounts):
+        with self.lock:
+            for node, account in accounts.items():
+                self._update(node, account)
+
+    def choose(self, candidates, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            eligible = [
+                n for n in dict.fromkeys(candidates)
+                if now - self.last_win.get(n, 0) >= self.cooldown
+            ]
+            if not eligible:
+                return None
+
+            # cumulative sum + bisect เฉพาะผู้มีสิทธิ์ (ผู้โหวตไม่กี่คน)
+            cumulative = []
+            total = 0
+            for n in eligible:
+                total += self.weights.get(n, 1)
+                cumulative.append(total)
+            return eligible[bisect.bisect_right(cumulative, self.rng.random() * total)]
@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# เก็บแค่ผลตัดสิน ไม่เก็บ face_scores ทั้งชุด
+FIELDS = ("verdict", "confidence")
+
+
+class VerdictCache:
+    """
+    Persistent LRU cache of AI verdicts keyed by (model, video sha256).
+
+    Entries hold only the verdict and confidence. They are kept in memory
+    and in SQLite (WAL mode); `put` writes one row instead of rewriting
+    the whole cache. A hit also moves `cached_at` to the time of use, so
+    the LRU order survives a restart.
+    """
+
+    def __init__(self, db_path="verdict_cache.db", max_entries=1000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " key TEXT PRIMARY KEY,"
+            " verdict TEXT NOT NULL,"
+            " confidence REAL NOT NULL,"
+            " cached_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+        # โหลดเรียงจากเก่าไปใหม่ (ลำดับ LRU)
+        for key, verdict, confidence, cached_at in self.conn.execute(
+            "SELECT key, verdict, confidence, cached_at FROM verdicts ORDER BY cached_at"
+        ):
+            self.entries[key] = {"verdict": verdict, "confidence": confidence, "cached_at": cached_at}
+        with self.lock:
+            self._evict()
+
+    @staticmethod
+    def make_key(video_hash, model):
+        return f"{model}:{video_hash}"
+
+    def _store(self, key, result, cached_at):
+        entry = {f: result[f] for f in FIELDS}
+        entry["cached_at"] = cached_at
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, verdict, confidence, cached_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, entry["verdict"], entry["confidence"], cached_at),
+            )
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+
+    def _evict(self):
+        evicted = []
+        while len(self.entries) > self.max_entries:
+            evicted.append(self.entries.popitem(last=False)[0])
+        if evicted:
+            with self.conn:
+                self.conn.executemany("DELETE FROM verdicts WHERE key = ?", [(k,) for k in evicted])
+
+    def get(self, video_hash, model):
+        key = self.make_key(video_hash, model)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            # cached_at = ใช้ล่าสุดเมื่อไร ตอนโหลดใหม่จึงเรียงตาม LRU ไม่ใช่ลำดับที่ใส่
+            entry["cached_at"] = time.time()
+            with self.conn:
+                self.conn.execute("UPDATE verdicts SET cached_at = ? WHERE key = ?",
+                                  (entry["cached_at"], key))
+            self.entries.move_to_end(key)
+            return dict(entry)
+
+    def put(self, video_hash, model, result):
+        key = self.make_key(video_hash, model)
+        with self.lock:
+            self._store(key, result, time.time())
+            self._evict()
@@ -1,14 +1,28 @@
 import cv2
 
-def extract_frames(video_path, max_frames=20):
+def iter_frames(video_path, max_frames=None, step=1):
+    """
+    Yield frames one at a time instead of holding them all in memory.
+    With `step`, only every step-th frame is decoded into an image (the
+    ones in between are skipped with grab()).
+    """
     cap = cv2.VideoCapture(video_path)
-    frames = []
+    count = 0
+    i = 0
 
-    while len(frames) < max_frames:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames.append(frame)
+    try:
+        while max_frames is None or count < max_frames:
+            if not cap.grab():
+                break
+            if i % step == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                count += 1
+                yield frame
+            i += 1
+    finally:
+        cap.release()
 
-    cap.release()
-    return frames
+def extract_frames(video_path, max_frames=20):
+    return list(iter_frames(video_path, max_frames))